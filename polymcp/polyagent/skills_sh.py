@@ -8,11 +8,12 @@ context block for LLM prompts.
 
 from __future__ import annotations
 
+import heapq
 import os
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 @dataclass
 class SkillShEntry:
@@ -20,12 +21,22 @@ class SkillShEntry:
     description: str
     content: str
     path: Path
+    # Matching text and its word set, derived once per entry
+    _haystack: str = field(init=False, repr=False, compare=False)
+    _tokens: frozenset = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._haystack = f"{self.name} {self.description} {self.content[:1500]}".lower()
+        self._tokens = frozenset(_WORD_RE.findall(self._haystack))
 
 
 _FRONTMATTER_RE = re.compile(r"^---\s*\n(.*?)\n---\s*\n", re.DOTALL)
 _KV_RE = re.compile(r"^([a-zA-Z0-9_\-]+)\s*:\s*(.*)$")
 _WORD_RE = re.compile(r"[a-z0-9_]+")
 
+# SKILL.md path -> ((mtime_ns, size, max_chars), parsed entry)
+_ENTRY_CACHE: Dict[Path, Tuple[Tuple[int, int, int], SkillShEntry]] = {}
+
 
 def _parse_frontmatter(text: str) -> tuple[dict, str]:
     match = _FRONTMATTER_RE.match(text)
@@ -88,7 +99,15 @@ def load_skills_sh(extra_dirs: Optional[Iterable[str]] = None, max_chars: int =
             if not skill_dir.is_dir():
                 continue
             skill_file = skill_dir / "SKILL.md"
-            if not skill_file.exists():
+            try:
+                st = skill_file.stat()
+            except OSError:
+                continue
+            # Unchanged files (same mtime and size) are not re-read or re-parsed
+            stamp = (st.st_mtime_ns, st.st_size, max_chars)
+            cached = _ENTRY_CACHE.get(skill_file)
+            if cached is not None and cached[0] == stamp:
+                entries.append(cached[1])
                 continue
             try:
                 text = skill_file.read_text(encoding="utf-8")
@@ -102,14 +121,14 @@ def load_skills_sh(extra_dirs: Optional[Iterable[str]] = None, max_chars: int =
             fm, rest = _parse_frontmatter(text)
             name = fm.get("name") or skill_dir.name
             desc = fm.get("description") or ""
-            entries.append(
-                SkillShEntry(
-                    name=str(name),
-                    description=str(desc),
-                    content=rest.strip(),
-                    path=skill_file,
-                )
+            entry = SkillShEntry(
+                name=str(name),
+                description=str(desc),
+                content=rest.strip(),
+                path=skill_file,
             )
+            _ENTRY_CACHE[skill_file] = (stamp, entry)
+            entries.append(entry)
     return entries
 
 
@@ -124,10 +143,10 @@ def match_skills_sh(
     query_tokens = set(_WORD_RE.findall((query or "").lower()))
     if not query_tokens:
         return skills[:max_skills]
+    query_phrase = query.strip().lower()
 
     def score(entry: SkillShEntry) -> float:
-        haystack = f"{entry.name} {entry.description} {entry.content[:1500]}".lower()
-        entry_tokens = set(_WORD_RE.findall(haystack))
+        entry_tokens = entry._tokens
         if not entry_tokens:
             return 0.0
 
@@ -137,15 +156,18 @@ def match_skills_sh(
 
         coverage = overlap / max(1, len(query_tokens))
         density = overlap / max(1, len(entry_tokens))
-        phrase_bonus = 0.2 if query.strip().lower() in haystack else 0.0
+        phrase_bonus = 0.2 if query_phrase in entry._haystack else 0.0
         return (coverage * 0.75) + (density * 0.25) + phrase_bonus
 
-    ranked = [(score(entry), entry) for entry in skills]
-    ranked.sort(key=lambda item: item[0], reverse=True)
-    selected = [entry for entry_score, entry in ranked if entry_score > 0.0]
-    if not selected:
+    scored = []
+    for entry in skills:
+        entry_score = score(entry)
+        if entry_score > 0.0:
+            scored.append((entry_score, entry))
+    if not scored:
         return skills[:max_skills]
-    return selected[:max_skills]
+    # Partial top-k; equivalent to a stable descending sort truncated to max_skills
+    return [entry for _, entry in heapq.nlargest(max_skills, scored, key=lambda item: item[0])]
 
 
 def build_skills_context(
@@ -50,18 +50,27 @@ from __future__ import annotations
 
 import asyncio
 import base64
+import bisect
 import hashlib
+import heapq
 import json
 import logging
+import queue
+import random
 import re
 import sys
+import threading
 import time
 import uuid
-from collections import defaultdict, deque
+import weakref
+from collections import Counter, OrderedDict, defaultdict, deque
 from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from functools import lru_cache
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Optional, Set, Tuple, Union
 
 import httpx
 
@@ -77,6 +86,262 @@ try:
 except Exception:
     TIKTOKEN_AVAILABLE = False
 
+# Fast JSON serialization (optional)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    ORJSON_AVAILABLE = False
+
+# HTTP/2 for httpx (optional)
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except Exception:
+    H2_AVAILABLE = False
+
+
+def _json_bytes(value: Any, sort_keys: bool = False) -> bytes:
+    """Serialize ``value`` to compact UTF-8 JSON, preferring orjson when installed."""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(value, default=str, option=option)
+        except TypeError:
+            # e.g. integers wider than 64 bits: let the stdlib handle them
+            pass
+    return json.dumps(
+        value, default=str, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys
+    ).encode("utf-8")
+
+
+def _json_text(value: Any, indent: Optional[int] = None) -> str:
+    """Serialize ``value`` for export; orjson covers the compact and 2-space layouts."""
+    if ORJSON_AVAILABLE and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS
+        if indent == 2:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(value, option=option).decode("utf-8")
+        except TypeError:
+            # Unsupported values: the stdlib either handles them or raises as before
+            pass
+    return json.dumps(value, indent=indent)
+
+
+def _json_loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON, preferring orjson when installed; raises json.JSONDecodeError."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity, >64-bit integers, ...: defer to the stdlib's verdict
+            pass
+    return json.loads(data)
+
+
+# Parameter coercion lookups, built once at import
+_NUM_CLEAN_RE = re.compile(r"[^\d.-]")
+_BOOL_TRUE = frozenset({"true", "yes", "y", "1", "on", "enabled"})
+_BOOL_FALSE = frozenset({"false", "no", "n", "0", "off", "disabled"})
+
+# Base64 sniffing: delete tables for bytes.translate (whitespace as matched by \s)
+_ASCII_WS = bytes(c for c in range(128) if chr(c).isspace())
+_B64_ALPHABET_WS = (
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=" + _ASCII_WS
+)
+
+# SSE "data:" lines (payload in group 1, still to be stripped), without splitting the body
+_SSE_DATA_RE = re.compile(r"^\s*data:(.*)$", re.MULTILINE)
+
+# Lenient JSON repair: drop a comma before a closing brace/bracket
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+
+# Whitespace runs collapsed in value previews
+_WS_RE = re.compile(r"\s+")
+
+# Lowercase word tokens of 4+ chars for response/output overlap checks
+_OVERLAP_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9._-]{3,}")
+
+
+def _tool_rank_key(tool: Dict[str, Any]) -> Tuple[float, float, str]:
+    """Ranking for tool lists: best success rate, then lowest latency, then name."""
+    return (-tool.get("_success_rate", 0.5), tool.get("_avg_latency", 9999.0), tool.get("name", ""))
+
+
+def _rank_tools(tools: List[Dict[str, Any]], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """``sorted(tools, key=_tool_rank_key)[:top_k]``, partially sorting when ``top_k`` is small."""
+    if top_k is not None and top_k < len(tools) // 2:
+        return heapq.nsmallest(top_k, tools, key=_tool_rank_key)
+    tools.sort(key=_tool_rank_key)
+    return tools
+
+
+def _is_error_payload(result: Any) -> bool:
+    """True for tool results that report a failure in-band (MCP ``isError`` or status "error")."""
+    return isinstance(result, dict) and (result.get("isError") is True or result.get("status") == "error")
+
+
+def _unit_vector(values: Any) -> Optional[Tuple[float, ...]]:
+    """``values`` scaled to length 1 (dot products are then cosines), or None for a zero vector."""
+    vector = tuple(float(v) for v in values)
+    norm = sum(v * v for v in vector) ** 0.5
+    if not norm:
+        return None
+    return tuple(v / norm for v in vector)
+
+
+# Bare token-like strings in payloads (see SecurityPolicy.redact_sensitive_data)
+_TOKEN_CHARS_RE = re.compile(r"[A-Za-z0-9+/=_-]+")
+_TOKEN_CHARS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=_-"
+
+
+def _is_token_like(text: str) -> bool:
+    """True if ``text`` consists only of base64/URL-safe token characters."""
+    # The regex rejects prose within the first few characters; translate then
+    # checks the remainder in a single C pass.
+    if _TOKEN_CHARS_RE.fullmatch(text, 0, 64) is None:
+        return False
+    return text.isascii() and not text.encode("ascii").translate(None, _TOKEN_CHARS)
+
+
+def _copy_containers(value: Any) -> Any:
+    """``value`` with every nested dict and list rebuilt (leaf values are shared)."""
+    if isinstance(value, dict):
+        return {k: _copy_containers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_containers(v) for v in value]
+    return value
+
+
+# browser_type text heuristics
+_QUOTED_RE = re.compile(r'["\']([^"\']+)["\']')
+_PLATE_RE = re.compile(r'\b([A-Z]{2}\d{3}[A-Z]{2})\b')
+
+
+# (whole second, "YYYY-MM-DDTHH:MM:SS") for the last log timestamp
+_LOG_SECOND: Tuple[int, str] = (-1, "")
+
+
+def _utc_timestamp() -> str:
+    """``datetime.utcnow().isoformat()`` layout, formatting the date/time part once per second."""
+    global _LOG_SECOND
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _LOG_SECOND
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _LOG_SECOND = (second, prefix)
+    micros = int((now - second) * 1_000_000)
+    return f"{prefix}.{micros:06d}" if micros else prefix
+
+
+def _stop_log_writer(listener: QueueListener, handler: logging.Handler) -> None:
+    """Drain queued log records to the file, then close it."""
+    listener.stop()
+    handler.close()
+
+
+@lru_cache(maxsize=256)
+def _stdio_server_id(command: Any, args: Tuple[Any, ...], env: Tuple[Tuple[Any, Any], ...]) -> str:
+    """Deterministic stdio server id; keyed on plain config data, not on the agent."""
+    # A short label, not a security digest: 4-byte BLAKE2b gives 8 hex chars.
+    # Fed piecewise, without building the joined "command|args|env" string.
+    hasher = hashlib.blake2b(digest_size=4)
+    hasher.update(str(command).encode())
+    hasher.update(b"|")
+    hasher.update(str(list(args)).encode())
+    hasher.update(b"|")
+    hasher.update(str(list(env)).encode())
+    return f"stdio://{command or 'unknown'}@{hasher.hexdigest()}"
+
+
+# Tab/console management tools hidden from the planner unless the task asks for tabs
+_PLANNER_MANAGEMENT_TOOLS = frozenset({"browser_tabs", "browser_console"})
+
+# Result fields kept by _compress_tool_output, in output order
+_PRIORITY_FIELDS: Tuple[str, ...] = (
+    "status",
+    "success",
+    "error",
+    "message",
+    "summary",
+    "content",
+    "messages",
+    "result",
+    "data",
+    "output",
+    "text",
+    "value",
+    "answer",
+    "final_answer",
+)
+
+# Payload fields checked (in order) by _result_signal_label
+_SIGNAL_FIELDS: Tuple[str, ...] = (
+    "content",
+    "result",
+    "data",
+    "message",
+    "messages",
+    "text",
+    "output",
+    "value",
+    "answer",
+    "final_answer",
+)
+
+# Bookkeeping keys skipped when looking for real content / preview text
+_METADATA_KEYS = frozenset({"status", "success", "ok", "latency", "duration", "metadata"})
+_IGNORABLE_KEYS = _METADATA_KEYS | {"_compressed", "_original_size"}
+
+# Fields _value_preview_text looks at first inside a dict
+_PREVIEW_FIELDS: Tuple[str, ...] = (
+    "final_answer",
+    "answer",
+    "content",
+    "result",
+    "data",
+    "output",
+    "value",
+    "message",
+    "text",
+)
+
+_JSON_STRUCTURAL_RE = re.compile(r'[{}"\\]')
+
+
+def _balanced_object_end(s: str, start: int) -> int:
+    """Index of the ``}`` closing the object opened at ``s[start]``, or -1.
+
+    Braces inside JSON string literals (with backslash escapes) are ignored.
+    """
+    depth = 0
+    in_string = False
+    escaped_at = -1
+    # Visit only the characters that can change state; the regex skips the rest in C
+    for match in _JSON_STRUCTURAL_RE.finditer(s, start):
+        i = match.start()
+        if i == escaped_at:
+            continue
+        c = s[i]
+        if in_string:
+            if c == "\\":
+                escaped_at = i + 1
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
 
 # =============================================================================
 # ENUMS & DATA CLASSES
@@ -94,6 +359,46 @@ class ErrorType(Enum):
     UNKNOWN = "unknown"
 
 
+# _classify_error precedence: the lowest rank found in the status code or message wins
+_ERROR_PRECEDENCE = (
+    ErrorType.TIMEOUT,
+    ErrorType.RATE_LIMIT,
+    ErrorType.AUTH,
+    ErrorType.NOT_FOUND,
+    ErrorType.SCHEMA,
+    ErrorType.TRANSIENT,
+    ErrorType.UNKNOWN,
+)
+_RANK_TIMEOUT = _ERROR_PRECEDENCE.index(ErrorType.TIMEOUT)
+_RANK_RATE_LIMIT = _ERROR_PRECEDENCE.index(ErrorType.RATE_LIMIT)
+_RANK_AUTH = _ERROR_PRECEDENCE.index(ErrorType.AUTH)
+_RANK_NOT_FOUND = _ERROR_PRECEDENCE.index(ErrorType.NOT_FOUND)
+_RANK_SCHEMA = _ERROR_PRECEDENCE.index(ErrorType.SCHEMA)
+_RANK_TRANSIENT = _ERROR_PRECEDENCE.index(ErrorType.TRANSIENT)
+_RANK_UNKNOWN = _ERROR_PRECEDENCE.index(ErrorType.UNKNOWN)
+_STATUS_ERROR_RANK = {
+    429: _RANK_RATE_LIMIT,
+    401: _RANK_AUTH,
+    403: _RANK_AUTH,
+    404: _RANK_NOT_FOUND,
+    400: _RANK_SCHEMA,
+}
+_KEYWORD_ERROR_RANK = {
+    "timeout": _RANK_TIMEOUT,
+    "rate_limit": _RANK_RATE_LIMIT,
+    "auth": _RANK_AUTH,
+    "not_found": _RANK_NOT_FOUND,
+    "schema": _RANK_SCHEMA,
+    "transient": _RANK_TRANSIENT,
+}
+# One case-insensitive pass over the message; the lookahead also reports overlapping keywords
+_ERROR_KEYWORD_RE = re.compile(
+    r"(?=(?P<timeout>timeout)|(?P<rate_limit>rate limit)|(?P<auth>unauthorized|auth)|(?P<not_found>not found)"
+    r"|(?P<schema>schema|validation)|(?P<transient>connection|network|refused))",
+    re.IGNORECASE,
+)
+
+
 class ToolConstraintType(Enum):
     REQUIRES_PREVIOUS = "requires_previous"
     MUTEX = "mutex"
@@ -131,12 +436,13 @@ class Budget:
 
     def __post_init__(self) -> None:
         self.start_time = time.time()
+        self._start_monotonic = time.monotonic()  # elapsed time immune to clock changes
         self.tokens_used = 0
         self.tool_calls_made = 0
         self.payload_bytes = 0
 
     def is_exceeded(self) -> Tuple[bool, Optional[str]]:
-        if self.max_wall_time and (time.time() - self.start_time) > self.max_wall_time:
+        if self.max_wall_time and (time.monotonic() - self._start_monotonic) > self.max_wall_time:
             return True, "wall_time"
         if self.max_tokens and self.tokens_used > self.max_tokens:
             return True, "tokens"
@@ -157,6 +463,7 @@ class Budget:
 
     def reset(self) -> None:
         self.start_time = time.time()
+        self._start_monotonic = time.monotonic()
         self.tokens_used = 0
         self.tool_calls_made = 0
         self.payload_bytes = 0
@@ -173,6 +480,11 @@ class ToolMetrics:
     last_failure: Optional[float] = None
     consecutive_failures: int = 0
 
+    def __post_init__(self) -> None:
+        # One shared string per server/tool across all metrics
+        self.tool_name = sys.intern(self.tool_name)
+        self.server_id = sys.intern(self.server_id)
+
     def success_rate(self) -> float:
         total = self.success_count + self.failure_count
         return self.success_count / total if total > 0 else 0.0
@@ -193,6 +505,19 @@ class ToolMetrics:
         self.last_failure = time.time()
         self.consecutive_failures += 1
 
+    def to_dict(self, key: str) -> Dict[str, Any]:
+        total = self.success_count + self.failure_count
+        return {
+            "key": key,
+            "tool": self.tool_name,
+            "server": self.server_id,
+            "success_count": self.success_count,
+            "failure_count": self.failure_count,
+            "success_rate": self.success_count / total if total > 0 else 0.0,
+            "avg_latency": self.total_latency / total if total > 0 else 0.0,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
 
 @dataclass
 class ServerHealthMetrics:
@@ -203,11 +528,14 @@ class ServerHealthMetrics:
     circuit_reset_after: float = 300.0
     failure_threshold: int = 5
 
+    def __post_init__(self) -> None:
+        self.server_id = sys.intern(self.server_id)
+
     def record_failure(self) -> None:
         self.consecutive_failures += 1
         if self.consecutive_failures >= self.failure_threshold:
             self.health = ServerHealth.CIRCUIT_OPEN
-            self.circuit_opened_at = time.time()
+            self.circuit_opened_at = time.monotonic()
 
     def record_success(self) -> None:
         self.consecutive_failures = 0
@@ -221,7 +549,7 @@ class ServerHealthMetrics:
         if self.health != ServerHealth.CIRCUIT_OPEN:
             return True
         if self.circuit_opened_at:
-            elapsed = time.time() - self.circuit_opened_at
+            elapsed = time.monotonic() - self.circuit_opened_at
             if elapsed > self.circuit_reset_after:
                 self.health = ServerHealth.DEGRADED
                 self.circuit_opened_at = None
@@ -233,16 +561,18 @@ class ServerHealthMetrics:
 class RateLimiter:
     max_calls: int
     window_seconds: float
-    calls: Deque[float] = field(default_factory=deque)
+    calls: List[float] = field(default_factory=list)  # time.monotonic() call times, ascending
     _last_trim: float = field(default=0.0, init=False, repr=False)
     _trim_cache_ttl: float = field(default=0.1, init=False, repr=False)
 
     def _trim(self) -> None:
-        now = time.time()
+        now = time.monotonic()
         if now - self._last_trim < self._trim_cache_ttl:
             return
-        while self.calls and now - self.calls[0] >= self.window_seconds:
-            self.calls.popleft()
+        # Drop every call at or before the window start in one slice delete
+        expired = bisect.bisect_right(self.calls, now - self.window_seconds)
+        if expired:
+            del self.calls[:expired]
         self._last_trim = now
 
     def can_call(self) -> bool:
@@ -250,7 +580,7 @@ class RateLimiter:
         return len(self.calls) < self.max_calls
 
     def record_call(self) -> None:
-        self.calls.append(time.time())
+        self.calls.append(time.monotonic())
 
     def wait_time(self) -> float:
         self._trim()
@@ -259,7 +589,41 @@ class RateLimiter:
         if not self.calls:
             return 0.0
         oldest = self.calls[0]
-        return max(0.0, self.window_seconds - (time.time() - oldest))
+        return max(0.0, self.window_seconds - (time.monotonic() - oldest))
+
+
+@dataclass
+class SignatureWindow:
+    """The last ``maxlen`` signatures, with O(1) membership via a count per signature."""
+
+    maxlen: int
+    _items: Deque[bytes] = field(init=False, repr=False)
+    _counts: Counter = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._items = deque()
+        self._counts = Counter()
+
+    def __contains__(self, signature: object) -> bool:
+        return signature in self._counts
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def append(self, signature: bytes) -> None:
+        if len(self._items) >= self.maxlen:
+            oldest = self._items.popleft()
+            remaining = self._counts[oldest] - 1
+            if remaining:
+                self._counts[oldest] = remaining
+            else:
+                del self._counts[oldest]
+        self._items.append(signature)
+        self._counts[signature] += 1
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._counts.clear()
 
 
 @dataclass
@@ -270,32 +634,57 @@ class AgentResult:
     error_type: Optional[ErrorType] = None
     latency: float = 0.0
     metadata: Dict[str, Any] = field(default_factory=dict)
+    _redacted: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    _previews: Dict[int, str] = field(default_factory=dict, init=False, repr=False, compare=False)  # max_chars -> text
+    # _json_bytes size of ``result``, when measured at execution
+    _payload_bytes: Optional[int] = field(default=None, init=False, repr=False, compare=False)
 
     def is_success(self) -> bool:
         return self.status == "success"
 
+    def redacted_result(self) -> Dict[str, Any]:
+        """Redacted copy of ``result``, computed once per result."""
+        if self._redacted is None:
+            self._redacted = SecurityPolicy.redact_sensitive_data(self.result or {})
+        return self._redacted
+
     def is_transient_error(self) -> bool:
         return self.error_type in {ErrorType.TRANSIENT, ErrorType.TIMEOUT, ErrorType.RATE_LIMIT}
 
 
+@dataclass
+class AgentAction:
+    """One executed step of a run, as kept in the action history."""
+    __slots__ = ("step", "tool", "parameters", "result")
+
+    step: int
+    tool: str
+    parameters: Dict[str, Any]
+    result: AgentResult
+
+
 @dataclass
 class StructuredLog:
+    __slots__ = ("timestamp", "trace_id", "level", "event", "data")
+
     timestamp: str
     trace_id: str
     level: str
     event: str
     data: Dict[str, Any]
 
+    def to_dict(self) -> Dict[str, Any]:
+        # Shallow: unlike asdict(), does not deep-copy ``data``
+        return {
+            "timestamp": self.timestamp,
+            "trace_id": self.trace_id,
+            "level": self.level,
+            "event": self.event,
+            "data": self.data,
+        }
+
     def to_json(self) -> str:
-        return json.dumps(
-            {
-                "timestamp": self.timestamp,
-                "trace_id": self.trace_id,
-                "level": self.level,
-                "event": self.event,
-                "data": self.data,
-            }
-        )
+        return _json_text(self.to_dict())
 
 
 @dataclass
@@ -312,84 +701,151 @@ class ToolConstraint:
 # =============================================================================
 
 
+# JSON schema "type" -> accepted Python types (bool passes number/integer, as before)
+_SCHEMA_TYPE_CHECKS: Dict[str, Tuple[Any, str]] = {
+    "string": (str, "string"),
+    "number": ((int, float), "number"),
+    "integer": (int, "integer"),
+    "boolean": (bool, "boolean"),
+    "array": (list, "array"),
+    "object": (dict, "object"),
+}
+_NUMERIC_SCHEMA_TYPES = frozenset({"number", "integer"})
+_DATE_FORMATS = frozenset({"date", "date-time"})
+_MISSING = object()
+
+# Field patterns of datetime.strptime's %Y-%m-%d / %H:%M:%S / .%f (strptime is case-insensitive)
+_STRP_DATE = r"(\d\d\d\d)-(1[0-2]|0[1-9]|[1-9])-(3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])"
+_DATE_RE = re.compile(_STRP_DATE)
+_DATE_TIME_RE = re.compile(
+    _STRP_DATE + r"T(2[0-3]|[0-1]\d|\d):([0-5]\d|\d):(6[0-1]|[0-5]\d|\d)(?:\.([0-9]{1,6}))?",
+    re.IGNORECASE,
+)
+_TZ_OFFSET_RE = re.compile(r"[+-]\d{2}:\d{2}$")
+
+
 class SchemaValidator:
     @staticmethod
     def _is_valid_date(date_str: str, fmt: str) -> bool:
+        # Same acceptance as strptime with "%Y-%m-%d" / "%Y-%m-%dT%H:%M:%S[.%f]",
+        # without strptime's per-call locale and format machinery.
+        if fmt == "date":
+            m = _DATE_RE.fullmatch(date_str)
+        elif fmt == "date-time":
+            s = _TZ_OFFSET_RE.sub("", date_str.replace("Z", ""))
+            m = _DATE_TIME_RE.fullmatch(s)
+        else:
+            return False
+        if m is None:
+            return False
+        fields = [int(g) for g in m.groups()[:6] if g is not None]
         try:
-            if fmt == "date":
-                datetime.strptime(date_str, "%Y-%m-%d")
-                return True
-            if fmt == "date-time":
-                s = date_str.replace("Z", "")
-                s = re.sub(r"[+-]\d{2}:\d{2}$", "", s)
-                candidates = ["%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f"]
-                for f in candidates:
-                    try:
-                        datetime.strptime(s, f)
-                        return True
-                    except ValueError:
-                        continue
-                return False
+            datetime(*fields)  # range checks: month lengths, leap years, seconds < 60
         except ValueError:
             return False
-        return False
+        return True
 
     @staticmethod
     def validate_parameters(
         parameters: Dict[str, Any], schema: Dict[str, Any]
     ) -> Tuple[bool, Optional[str], Optional[Dict[str, Any]]]:
-        properties = schema.get("properties", {}) or {}
-        required = schema.get("required", []) or []
-        required_set = set(required)
-
         if parameters is None:
             parameters = {}
+        if not schema:
+            return True, None, None
+
+        required, required_set, rules = SchemaValidator._compile(schema)
 
         for req_param in required:
             if req_param not in parameters or parameters.get(req_param) is None:
                 return False, f"Missing required parameter: {req_param}", None
 
         for param_name, param_value in parameters.items():
-            if param_name not in properties:
+            rule = rules.get(param_name)
+            if rule is None:
                 continue
 
-            param_schema = properties.get(param_name) or {}
-            expected_type = param_schema.get("type", "any")
-
             if param_value is None and param_name not in required_set:
                 continue
 
-            if expected_type == "string" and not isinstance(param_value, str):
-                return False, f"Parameter '{param_name}' should be string", None
-            if expected_type == "number" and not isinstance(param_value, (int, float)):
-                return False, f"Parameter '{param_name}' should be number", None
-            if expected_type == "integer" and not isinstance(param_value, int):
-                return False, f"Parameter '{param_name}' should be integer", None
-            if expected_type == "boolean" and not isinstance(param_value, bool):
-                return False, f"Parameter '{param_name}' should be boolean", None
-            if expected_type == "array" and not isinstance(param_value, list):
-                return False, f"Parameter '{param_name}' should be array", None
-            if expected_type == "object" and not isinstance(param_value, dict):
-                return False, f"Parameter '{param_name}' should be object", None
-
-            if "enum" in param_schema:
-                if param_value not in param_schema["enum"]:
-                    return False, f"Parameter '{param_name}' must be one of {param_schema['enum']}", None
-
-            if expected_type in {"number", "integer"} and isinstance(param_value, (int, float)):
-                if "minimum" in param_schema and param_value < param_schema["minimum"]:
-                    return False, f"Parameter '{param_name}' must be >= {param_schema['minimum']}", None
-                if "maximum" in param_schema and param_value > param_schema["maximum"]:
-                    return False, f"Parameter '{param_name}' must be <= {param_schema['maximum']}", None
+            types, label, enum, numeric, minimum, maximum, date_fmt = rule
 
-            fmt = param_schema.get("format")
-            if fmt and isinstance(param_value, str):
-                if fmt in {"date", "date-time"}:
-                    if not SchemaValidator._is_valid_date(param_value, fmt):
-                        return False, f"Parameter '{param_name}' has invalid {fmt} format", None
+            if types is not None and not isinstance(param_value, types):
+                return False, f"Parameter '{param_name}' should be {label}", None
+
+            if enum is not _MISSING and param_value not in enum:
+                return False, f"Parameter '{param_name}' must be one of {enum}", None
+
+            if numeric and isinstance(param_value, (int, float)):
+                if minimum is not _MISSING and param_value < minimum:
+                    return False, f"Parameter '{param_name}' must be >= {minimum}", None
+                if maximum is not _MISSING and param_value > maximum:
+                    return False, f"Parameter '{param_name}' must be <= {maximum}", None
+
+            if date_fmt and isinstance(param_value, str):
+                if not SchemaValidator._is_valid_date(param_value, date_fmt):
+                    return False, f"Parameter '{param_name}' has invalid {date_fmt} format", None
 
         return True, None, None
 
+    @staticmethod
+    def required_parameters(schema: Dict[str, Any]) -> FrozenSet[str]:
+        """Required parameter names, from the same per-schema cache as validation."""
+        if not schema:
+            return frozenset()
+        return SchemaValidator._compile(schema)[1]
+
+    # Canonical schema JSON -> compiled rules (LRU). Keyed on content, so a schema
+    # mutated in place or a new one at a recycled address never hits a stale entry.
+    _compiled: "OrderedDict[bytes, Tuple[Any, ...]]" = OrderedDict()
+    _compiled_max = 1024
+    _compiled_lock = threading.Lock()  # parameter extraction validates from executor threads
+
+    @staticmethod
+    def _compile(schema: Dict[str, Any]) -> Tuple[Any, ...]:
+        """Pre-digest a tool schema into per-parameter check tuples (cached per schema content)."""
+        cache = SchemaValidator._compiled
+        try:
+            key: Optional[bytes] = _json_bytes(schema, sort_keys=True)
+        except (TypeError, ValueError):
+            key = None  # unsortable mixed-type keys: compile uncached
+        if key is not None:
+            with SchemaValidator._compiled_lock:
+                compiled = cache.get(key)
+                if compiled is not None:
+                    cache.move_to_end(key)
+                    return compiled
+
+        properties = schema.get("properties", {}) or {}
+        required = schema.get("required", []) or []
+        rules: Dict[str, Tuple[Any, ...]] = {}
+        for param_name in properties:
+            param_schema = properties.get(param_name) or {}
+            expected_type = param_schema.get("type", "any")
+            # Union types (lists) are not type-checked
+            if not isinstance(expected_type, str):
+                expected_type = "any"
+            types, label = _SCHEMA_TYPE_CHECKS.get(expected_type, (None, None))
+            fmt = param_schema.get("format")
+            enum = param_schema.get("enum", _MISSING)
+            rules[param_name] = (
+                types,
+                label,
+                list(enum) if isinstance(enum, list) else enum,  # detached from the caller's schema
+                expected_type in _NUMERIC_SCHEMA_TYPES,
+                param_schema.get("minimum", _MISSING),
+                param_schema.get("maximum", _MISSING),
+                fmt if isinstance(fmt, str) and fmt in _DATE_FORMATS else None,
+            )
+
+        compiled = (tuple(required), frozenset(required), rules)
+        if key is not None:
+            with SchemaValidator._compiled_lock:
+                cache[key] = compiled
+                while len(cache) > SchemaValidator._compiled_max:
+                    cache.popitem(last=False)
+        return compiled
+
 
 class SecurityPolicy:
     SENSITIVE_PATTERNS = [
@@ -402,25 +858,42 @@ class SecurityPolicy:
         r"credentials?",
         r"private[_-]?key",
     ]
+    # All patterns as one alternation, so each key is scanned once
+    _SENSITIVE_KEY_RE = re.compile("|".join(SENSITIVE_PATTERNS))
 
     @staticmethod
     def redact_sensitive_data(data: Any, max_depth: int = 10) -> Any:
         if max_depth <= 0:
             return "[MAX_DEPTH_REACHED]"
 
+        # Copy-on-write: containers are only rebuilt once something inside them
+        # changes, so clean (or already redacted) data comes back as-is.
         if isinstance(data, dict):
-            redacted = {}
-            for key, value in data.items():
+            redacted = None
+            for i, (key, value) in enumerate(data.items()):
                 key_lower = str(key).lower()
-                is_sensitive = any(re.search(p, key_lower) for p in SecurityPolicy.SENSITIVE_PATTERNS)
-                redacted[key] = "[REDACTED]" if is_sensitive else SecurityPolicy.redact_sensitive_data(value, max_depth - 1)
-            return redacted
+                is_sensitive = SecurityPolicy._SENSITIVE_KEY_RE.search(key_lower) is not None
+                new_value = "[REDACTED]" if is_sensitive else SecurityPolicy.redact_sensitive_data(value, max_depth - 1)
+                if redacted is None:
+                    if new_value is value:
+                        continue
+                    redacted = dict(islice(data.items(), i))
+                redacted[key] = new_value
+            return data if redacted is None else redacted
 
         if isinstance(data, list):
-            return [SecurityPolicy.redact_sensitive_data(x, max_depth - 1) for x in data]
+            redacted_list = None
+            for i, value in enumerate(data):
+                new_value = SecurityPolicy.redact_sensitive_data(value, max_depth - 1)
+                if redacted_list is None:
+                    if new_value is value:
+                        continue
+                    redacted_list = data[:i]
+                redacted_list.append(new_value)
+            return data if redacted_list is None else redacted_list
 
         if isinstance(data, str):
-            if len(data) > 50 and re.fullmatch(r"[A-Za-z0-9+/=_-]+", data):
+            if len(data) > 50 and _is_token_like(data):
                 return "[REDACTED_TOKEN]"
             return data
 
@@ -437,6 +910,13 @@ class SecurityPolicy:
 
 class TokenEstimator:
     _encoder = None
+    _prefix_tokens: Dict[str, int] = {}
+    # BPE counts for long texts, keyed by content digest (LRU); the lock covers
+    # prompts estimated from executor threads
+    _cache: "OrderedDict[bytes, int]" = OrderedDict()
+    _cache_lock = threading.Lock()
+    _cache_size = 512
+    _cache_min_chars = 256
 
     @classmethod
     def get_encoder(cls):
@@ -453,16 +933,44 @@ class TokenEstimator:
             return 0
         encoder = TokenEstimator.get_encoder()
         if encoder:
+            cache = TokenEstimator._cache
+            key = None
+            if len(text) >= TokenEstimator._cache_min_chars:
+                key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+                with TokenEstimator._cache_lock:
+                    count = cache.get(key)
+                    if count is not None:
+                        cache.move_to_end(key)
+                if count is not None:
+                    return count
             try:
-                return len(encoder.encode(text))
+                # Prompts are plain text: skip the special-token scan
+                count = len(encoder.encode(text, disallowed_special=()))
             except Exception:
-                pass
+                count = None
+            if count is not None:
+                if key is not None:
+                    with TokenEstimator._cache_lock:
+                        cache[key] = count
+                        while len(cache) > TokenEstimator._cache_size:
+                            cache.popitem(last=False)
+                return count
         code_indicators = sum(text.count(c) for c in "{}[]():;")
         total_chars = len(text)
         if code_indicators > total_chars * 0.1:
             return max(1, total_chars // 2)
         return max(1, total_chars // 4)
 
+    @classmethod
+    def estimate_prompt_tokens(cls, prompt: str, prefix: str = "") -> int:
+        """Estimate a prompt that starts with a static prefix, counting the prefix once."""
+        if not prefix or not prompt.startswith(prefix):
+            return cls.estimate_tokens(prompt)
+        cached = cls._prefix_tokens.get(prefix)
+        if cached is None:
+            cached = cls._prefix_tokens[prefix] = cls.estimate_tokens(prefix)
+        return cached + cls.estimate_tokens(prompt[len(prefix):])
+
 
 # =============================================================================
 # MAIN AGENT CLASS
@@ -474,9 +982,15 @@ class UnifiedPolyAgent:
     Unified PolyAgent - HYBRID Edition (v3.2)
     
     Best of both worlds with fixed planner/validator.
+
+    Prompt layout invariant: every LLM prompt begins with one of the *_SYSTEM
+    strings below, byte-for-byte and unmodified, and all per-call content
+    (tools, skills context, history, the user message) follows it. This keeps
+    the prefix stable for provider-side prompt caching and lets
+    TokenEstimator count it once.
     """
 
-    # System prompts
+    # System prompts (static prompt prefixes; see the class docstring)
     PLANNER_SYSTEM = """You are a strategic planner for an AI agent.
 
 Create a SHORT plan (2-4 steps) to accomplish the user's goal.
@@ -550,50 +1064,72 @@ Rules:
 
     @staticmethod
     def _generate_server_id(config: Dict[str, Any]) -> str:
-        components = [
-            config.get("command", ""),
-            str(config.get("args", [])),
-            str(sorted((config.get("env", {}) or {}).items())),
-        ]
-        hash_input = "|".join(components)
-        hash_digest = hashlib.md5(hash_input.encode()).hexdigest()[:8]
-        return f"stdio://{config.get('command', 'unknown')}@{hash_digest}"
+        command = config.get("command", "")
+        args = tuple(config.get("args", []) or ())
+        env = tuple(sorted((config.get("env", {}) or {}).items()))
+        try:
+            return _stdio_server_id(command, args, env)
+        except TypeError:
+            # Unhashable args/env values (lists, dicts) cannot key the cache
+            return _stdio_server_id.__wrapped__(command, args, env)
 
     @staticmethod
     def _extract_first_json_object(text: str) -> Optional[Dict[str, Any]]:
         if not text:
             return None
         s = text.strip()
-        s = re.sub(r"^```(?:json)?\s*", "", s, flags=re.IGNORECASE)
-        s = re.sub(r"\s*```$", "", s)
-
-        start_positions = [m.start() for m in re.finditer(r"\{", s)]
-        for start in start_positions:
-            depth = 0
-            for i in range(start, len(s)):
-                if s[i] == "{":
-                    depth += 1
-                elif s[i] == "}":
-                    depth -= 1
-                    if depth == 0:
-                        candidate = s[start: i + 1].strip()
-                        try:
-                            return json.loads(candidate)
-                        except json.JSONDecodeError:
-                            try:
-                                repaired = re.sub(r",(\s*[}\]])", r"\1", candidate)
-                                return json.loads(repaired)
-                            except json.JSONDecodeError:
-                                break
+        if s.startswith("```"):
+            s = s[3:]
+            if s[:4].lower() == "json":
+                s = s[4:]
+            s = s.lstrip()
+        if s.endswith("```"):
+            s = s[:-3].rstrip()
+
+        # Fast path: the whole reply is the object
+        if s.startswith("{") and s.endswith("}"):
+            try:
+                obj = _json_loads(s)
+                if isinstance(obj, dict):
+                    return obj
+            except json.JSONDecodeError:
+                pass
+
+        start = s.find("{")
+        while start != -1:
+            end = _balanced_object_end(s, start)
+            if end == -1:
+                start = s.find("{", start + 1)
+                continue
+            candidate = s[start: end + 1]
+            try:
+                return _json_loads(candidate)
+            except json.JSONDecodeError:
+                try:
+                    return _json_loads(_TRAILING_COMMA_RE.sub(r"\1", candidate))
+                except json.JSONDecodeError:
+                    pass
+            start = s.find("{", start + 1)
         return None
 
     @staticmethod
     def _is_likely_base64(text: str, min_length: int = 100) -> bool:
         if not isinstance(text, str) or len(text) < min_length:
             return False
-        if not re.fullmatch(r"[A-Za-z0-9+/=\s]+", text):
+        head = text[:64]
+        if head.isascii() and head.encode("ascii").translate(None, _B64_ALPHABET_WS):
+            # Rejects prose before copying the whole payload
+            return False
+        if not text.isascii():
+            # Only (Unicode) whitespace may be non-ASCII in a base64 payload
+            text = "".join(text.split())
+            if not text.isascii():
+                return False
+        data = text.encode("ascii")
+        # Anything left after deleting the alphabet and whitespace disqualifies it
+        if data.translate(None, _B64_ALPHABET_WS):
             return False
-        compact = re.sub(r"\s+", "", text)
+        compact = data.translate(None, _ASCII_WS)
         try:
             base64.b64decode(compact, validate=True)
             return True
@@ -626,6 +1162,15 @@ Rules:
         tools_cache_ttl: float = 60.0,
         max_memory_size: int = 50,
         max_relevant_tools: int = 15,
+        inter_step_delay: float = 0.0,
+        max_connections: int = 500,
+        max_keepalive_connections: int = 100,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 30.0,
+        max_discovery_concurrency: int = 8,
+        http2: bool = False,
+        tool_result_cache_ttl: float = 0.0,
+        cacheable_tools: Optional[Set[str]] = None,
         # Retry
         max_retries: int = 3,
         retry_backoff: float = 1.0,
@@ -638,6 +1183,7 @@ Rules:
         # Observability
         enable_structured_logs: bool = True,
         log_file: Optional[str] = None,
+        max_structured_logs: Optional[int] = 10000,
         # Architecture - FIXED DEFAULTS
         use_planner: bool = True,
         planning_mode: str = "soft",  # ✅ SOFT by default (was causing issues!)
@@ -645,6 +1191,9 @@ Rules:
         validation_mode: str = "conservative",  # ✅ CONSERVATIVE by default
         goal_achievement_threshold: float = 0.85,  # ✅ Higher threshold (was 0.7)
         planner_max_tools: int = 50,  # ✅ More tools for planner (was 30)
+        plan_cache_size: int = 0,
+        plan_embedding_fn: Optional[Callable[[str], Any]] = None,  # sync (run in an executor) or async
+        plan_cache_similarity: float = 0.90,
         # Never-stuck controls
         never_stuck_mode: bool = True,
         max_no_progress_steps: int = 4,
@@ -663,6 +1212,16 @@ Rules:
         self.stdio_clients: Dict[str, MCPStdioClient] = {}
         self.stdio_adapters: Dict[str, MCPStdioAdapter] = {}
         self.http_client: Optional[httpx.AsyncClient] = None
+        self.http_limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http_timeout = httpx.Timeout(30.0, connect=connect_timeout)
+        self._invoke_urls: Dict[Tuple[str, str], str] = {}
+        self.max_discovery_concurrency = max_discovery_concurrency
+        # Opt-in: multiplex requests per server over one connection (needs h2 installed)
+        self.http2 = bool(http2) and H2_AVAILABLE
 
         # JSON-RPC session management
         self._jsonrpc_sessions: Dict[str, str] = {}
@@ -670,18 +1229,30 @@ Rules:
         self._jsonrpc_request_id: int = 0
 
         # Cache/Registry
-        self.stdio_tools_cache: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}
+        self.stdio_tools_cache: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}  # server id -> (tools, monotonic time)
         self.tools_cache_ttl = tools_cache_ttl
+        self._tools_refresh_task: Optional["asyncio.Future[None]"] = None  # keeps stdio_tools_cache warm
+        self._tools_refresh_locks: Dict[str, asyncio.Lock] = {}  # server id -> lock around get_tools()
+        self._tools_refresh_loop: Optional[asyncio.AbstractEventLoop] = None
         self.tool_registry: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._tool_index: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (server id, name) -> registered tool
         self.tool_constraints: Dict[str, ToolConstraint] = {}
+        self._params_desc_cache: Dict[Tuple[Optional[str], Optional[str]], Tuple[Dict[str, Any], str]] = {}
+        # Results of read-only tools (readOnlyHint or cacheable_tools); disabled while the TTL is 0
+        self.tool_result_cache_ttl = max(0.0, float(tool_result_cache_ttl))
+        self.cacheable_tools = set(cacheable_tools or ())
+        self._tool_result_cache: "OrderedDict[Tuple[str, int, str, bytes], Tuple[float, bytes]]" = OrderedDict()
+        # Bumped whenever a non-cacheable (possibly mutating) tool runs on the server; part of the key
+        self._tool_cache_epochs: Dict[str, int] = defaultdict(int)
 
         # Memory
-        self._persistent_history: Optional[List[Dict[str, Any]]] = [] if memory_enabled else None
+        self._persistent_history: Optional[List[AgentAction]] = [] if memory_enabled else None
         self.max_memory_size = max_memory_size
         self._long_term_summary: Optional[str] = None
 
         # Controls
         self.max_relevant_tools = max_relevant_tools
+        self.inter_step_delay = max(0.0, float(inter_step_delay))
         self.goal_achievement_threshold = goal_achievement_threshold
         self.planner_max_tools = planner_max_tools
         self.never_stuck_mode = never_stuck_mode
@@ -690,8 +1261,8 @@ Rules:
         self.loop_guard_window = max(4, int(loop_guard_window))
         self._no_progress_steps = 0
         self._tool_cooldowns: Dict[str, int] = {}
-        self._recent_call_signatures: Deque[str] = deque(maxlen=self.loop_guard_window)
-        self._recent_result_signatures: Deque[str] = deque(maxlen=self.loop_guard_window)
+        self._recent_call_signatures = SignatureWindow(self.loop_guard_window)
+        self._recent_result_signatures = SignatureWindow(self.loop_guard_window)
 
         # Budget
         self.budget = Budget(
@@ -710,6 +1281,7 @@ Rules:
         # Rate limiting
         self.enable_rate_limiting = enable_rate_limiting
         self.rate_limiters: Dict[str, RateLimiter] = {}
+        self._rate_limiter_keys: Dict[Tuple[str, str], Tuple[str, str]] = {}
         self.default_rate_limit = default_rate_limit
 
         # Retry
@@ -725,10 +1297,14 @@ Rules:
         self.enable_structured_logs = enable_structured_logs
         self.log_file = log_file
         self.trace_id = self._generate_trace_id()
+        # Oldest entries are dropped in batches past max_structured_logs (None = unbounded)
         self.structured_logs: List[StructuredLog] = []
+        self.max_structured_logs = None if max_structured_logs is None else max(0, int(max_structured_logs))
 
+        self._file_logger: Optional[logging.Logger] = None
+        self._log_writer_finalizer: Optional[weakref.finalize] = None
         if self.log_file:
-            logging.basicConfig(filename=self.log_file, level=logging.INFO, format="%(message)s")
+            self._start_log_writer()
 
         # Architecture - FIXED
         self.use_planner = use_planner
@@ -738,6 +1314,13 @@ Rules:
         self.current_plan: Optional[List[Dict[str, Any]]] = None
         self._plan_failures: int = 0  # ✅ Track failures for re-planning
 
+        # Initial plans reused for repeated requests over the same tools (off while the size is 0);
+        # with plan_embedding_fn, near-duplicate requests (cosine >= plan_cache_similarity) match too
+        self.plan_cache_size = max(0, int(plan_cache_size))
+        self.plan_embedding_fn = plan_embedding_fn
+        self.plan_cache_similarity = float(plan_cache_similarity)
+        self._plan_cache: "OrderedDict[Tuple[str, FrozenSet[str]], Tuple[Optional[Tuple[float, ...]], List[Dict[str, Any]]]]" = OrderedDict()
+
         # Cancellation
         self._cancellation_token = asyncio.Event()
 
@@ -748,6 +1331,7 @@ Rules:
         self.skills_sh_max_chars = int(skills_sh_max_chars)
         self._skills_sh_entries = load_skills_sh(self.skills_sh_dirs) if self.skills_sh_enabled else []
         self._skills_sh_warning_shown = False
+        self._skills_sh_context_cache: Dict[str, str] = {}
         if self.skills_sh_enabled and not self._skills_sh_entries:
             self._warn_missing_project_skills()
 
@@ -757,12 +1341,20 @@ Rules:
     def _get_skills_sh_context(self, user_message: str) -> str:
         if not self.skills_sh_enabled or not self._skills_sh_entries:
             return ""
-        return build_skills_context(
+        # Planner and parameter prompts ask for the same message every step
+        cached = self._skills_sh_context_cache.get(user_message)
+        if cached is not None:
+            return cached
+        ctx = build_skills_context(
             user_message,
             self._skills_sh_entries,
             max_skills=self.skills_sh_max_skills,
             max_total_chars=self.skills_sh_max_chars,
         )
+        if len(self._skills_sh_context_cache) >= 128:
+            self._skills_sh_context_cache.clear()
+        self._skills_sh_context_cache[user_message] = ctx
+        return ctx
 
     def _warn_missing_project_skills(self) -> None:
         if self._skills_sh_warning_shown:
@@ -781,23 +1373,52 @@ Rules:
             return
 
         if self.redact_logs:
-            data = SecurityPolicy.redact_sensitive_data(data)
+            # Redaction is copy-on-write: detach the entry from the caller's (live) containers
+            data = _copy_containers(SecurityPolicy.redact_sensitive_data(data))
 
         entry = StructuredLog(
-            timestamp=datetime.utcnow().isoformat(),
+            timestamp=_utc_timestamp(),
             trace_id=self.trace_id,
-            level=level,
-            event=event,
+            level=sys.intern(level),
+            event=sys.intern(event),
             data=data,
         )
-        self.structured_logs.append(entry)
+        logs = self.structured_logs
+        logs.append(entry)
+        cap = self.max_structured_logs
+        if cap is not None and len(logs) > cap + max(1, cap // 10):
+            # One slice delete per batch rather than a front pop per entry
+            del logs[: len(logs) - cap]
 
         if self.log_file:
-            logging.info(entry.to_json())
+            if self._file_logger is None:
+                self._start_log_writer()  # reopened after stop()
+            self._file_logger.info(entry.to_json())
 
         if self.verbose and level in {"ERROR", "WARNING", "INFO"}:
             print(f"[{level}] {event}: {data}")
 
+    def _start_log_writer(self) -> None:
+        """Route log_file output through a queue so file writes happen off the event loop."""
+        handler = logging.FileHandler(self.log_file)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        listener = QueueListener(log_queue, handler)
+        listener.start()
+
+        # Unregistered logger: private to this agent and collected with it
+        logger = logging.Logger(f"{__name__}.{self.trace_id}", logging.INFO)
+        logger.addHandler(QueueHandler(log_queue))
+        self._file_logger = logger
+        # Flushes and closes the file on stop(), garbage collection or interpreter exit
+        self._log_writer_finalizer = weakref.finalize(self, _stop_log_writer, listener, handler)
+
+    def _stop_log_writer(self) -> None:
+        if self._log_writer_finalizer is not None:
+            self._log_writer_finalizer()
+        self._log_writer_finalizer = None
+        self._file_logger = None
+
     def _load_registry(self, registry_path: str) -> None:
         try:
             with open(registry_path, "r", encoding="utf-8") as f:
@@ -852,61 +1473,62 @@ Rules:
     async def start(self) -> None:
         if not self.http_client:
             self.http_client = httpx.AsyncClient(
-                timeout=30.0,
+                timeout=self.http_timeout,
                 headers=self.http_headers,
-                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                limits=self.http_limits,
+                http2=self.http2,
             )
 
         started_servers: List[str] = []
         try:
-            for cfg in self.stdio_configs:
-                try:
-                    config = MCPServerConfig(command=cfg["command"], args=cfg.get("args", []), env=cfg.get("env"))
-                    client = MCPStdioClient(config)
-                    await client.start()
-                    adapter = MCPStdioAdapter(client)
-
-                    server_id = self._generate_server_id(cfg)
-                    self.stdio_clients[server_id] = client
-                    self.stdio_adapters[server_id] = adapter
-                    started_servers.append(server_id)
-
-                    if self.enable_health_checks:
-                        self.server_health[server_id] = ServerHealthMetrics(
-                            server_id=server_id, failure_threshold=self.circuit_breaker_threshold
-                        )
-
-                    if self.enable_rate_limiting:
-                        self.rate_limiters[server_id] = RateLimiter(max_calls=self.default_rate_limit, window_seconds=60.0)
-
-                    tools = await adapter.get_tools()
-                    for t in tools:
-                        constraint = self._parse_tool_constraints(t)
-                        if constraint:
-                            self.tool_constraints[t["name"]] = constraint
-
-                    self._log(
-                        "INFO",
-                        "stdio_server_started",
-                        {"server_id": server_id, "tools_count": len(tools), "constraints": sum(1 for t in tools if "constraints" in t)},
+            # Servers are independent processes: spawn and handshake them concurrently
+            semaphore = asyncio.Semaphore(max(1, self.max_discovery_concurrency))
+            results = await asyncio.gather(
+                *(self._start_stdio_server(cfg, semaphore) for cfg in self.stdio_configs),
+                return_exceptions=True,
+            )
+            failures = [(cfg, r) for cfg, r in zip(self.stdio_configs, results) if isinstance(r, BaseException)]
+            if failures:
+                cfg, error = failures[0]
+                started = [r for r in results if not isinstance(r, BaseException)]
+                self._log(
+                    "ERROR",
+                    "partial_start_failure",
+                    {"failed_server": cfg.get("command"), "error": str(error), "cleaning_up": len(started)},
+                )
+                for sid, client, _, _ in started:
+                    try:
+                        await client.stop()
+                    except Exception as cleanup_error:
+                        self._log("ERROR", "cleanup_failed", {"server_id": sid, "error": str(cleanup_error)})
+
+                self.stdio_clients.clear()
+                self.stdio_adapters.clear()
+                raise error
+
+            for server_id, client, adapter, tools in results:
+                self.stdio_clients[server_id] = client
+                self.stdio_adapters[server_id] = adapter
+                started_servers.append(server_id)
+
+                if self.enable_health_checks:
+                    self.server_health[server_id] = ServerHealthMetrics(
+                        server_id=server_id, failure_threshold=self.circuit_breaker_threshold
                     )
 
-                except Exception as e:
-                    self._log(
-                        "ERROR",
-                        "partial_start_failure",
-                        {"failed_server": cfg.get("command"), "error": str(e), "cleaning_up": len(started_servers)},
-                    )
-                    for sid in started_servers:
-                        try:
-                            await self.stdio_clients[sid].stop()
-                        except Exception as cleanup_error:
-                            self._log("ERROR", "cleanup_failed", {"server_id": sid, "error": str(cleanup_error)})
-
-                    self.stdio_clients.clear()
-                    self.stdio_adapters.clear()
-                    started_servers.clear()
-                    raise
+                if self.enable_rate_limiting:
+                    self.rate_limiters[server_id] = RateLimiter(max_calls=self.default_rate_limit, window_seconds=60.0)
+
+                for t in tools:
+                    constraint = self._parse_tool_constraints(t)
+                    if constraint:
+                        self.tool_constraints[t["name"]] = constraint
+
+                self._log(
+                    "INFO",
+                    "stdio_server_started",
+                    {"server_id": server_id, "tools_count": len(tools), "constraints": sum(1 for t in tools if "constraints" in t)},
+                )
         finally:
             self._log(
                 "INFO",
@@ -921,6 +1543,26 @@ Rules:
         await self._discover_http_tools()
         if self.stdio_clients or self.mcp_servers:
             await self._wait_for_readiness()
+        self._start_tools_refresh()
+
+    async def _start_stdio_server(
+        self, cfg: Dict[str, Any], semaphore: asyncio.Semaphore
+    ) -> Tuple[str, MCPStdioClient, MCPStdioAdapter, List[Dict[str, Any]]]:
+        """Start one stdio server and list its tools; the client is stopped again on failure."""
+        async with semaphore:
+            config = MCPServerConfig(command=cfg["command"], args=cfg.get("args", []), env=cfg.get("env"))
+            client = MCPStdioClient(config)
+            await client.start()
+            try:
+                adapter = MCPStdioAdapter(client)
+                tools = await adapter.get_tools()
+            except BaseException:
+                try:
+                    await client.stop()
+                except Exception as cleanup_error:
+                    self._log("ERROR", "cleanup_failed", {"server_id": cfg.get("command"), "error": str(cleanup_error)})
+                raise
+            return self._generate_server_id(cfg), client, adapter, tools
 
     # -------------------------------------------------------------------------
     # JSON-RPC Protocol Support
@@ -1055,33 +1697,31 @@ Rules:
 
     def _extract_session_id(self, response: httpx.Response) -> Optional[str]:
         """Extract session ID from response headers or body."""
-        for header in ["mcp-session-id", "Mcp-Session-Id", "MCP-Session-ID", "x-session-id"]:
-            if header.lower() in [h.lower() for h in response.headers.keys()]:
-                for key in response.headers.keys():
-                    if key.lower() == header.lower():
-                        return response.headers[key]
+        # httpx headers are case-insensitive
+        for header in ("mcp-session-id", "x-session-id"):
+            session_id = response.headers.get(header)
+            if session_id is not None:
+                return session_id
 
         body = response.text
-        for line in body.split('\n'):
-            line = line.strip()
-            if line.startswith('data:'):
-                try:
-                    data = json.loads(line[5:].strip())
-                    if isinstance(data, dict):
-                        if 'result' in data and isinstance(data['result'], dict):
-                            result = data['result']
-                            for key in ['sessionId', 'session_id', 'id']:
-                                if key in result:
-                                    return str(result[key])
-                            if '_meta' in result and isinstance(result['_meta'], dict):
-                                for key in ['sessionId', 'session_id']:
-                                    if key in result['_meta']:
-                                        return str(result['_meta'][key])
-                except json.JSONDecodeError:
-                    continue
+        for match in _SSE_DATA_RE.finditer(body):
+            try:
+                data = _json_loads(match.group(1).strip())
+                if isinstance(data, dict):
+                    if 'result' in data and isinstance(data['result'], dict):
+                        result = data['result']
+                        for key in ['sessionId', 'session_id', 'id']:
+                            if key in result:
+                                return str(result[key])
+                        if '_meta' in result and isinstance(result['_meta'], dict):
+                            for key in ['sessionId', 'session_id']:
+                                if key in result['_meta']:
+                                    return str(result['_meta'][key])
+            except json.JSONDecodeError:
+                continue
 
         try:
-            data = json.loads(body)
+            data = _json_loads(body)
             if isinstance(data, dict):
                 if 'result' in data and isinstance(data['result'], dict):
                     result = data['result']
@@ -1096,26 +1736,39 @@ Rules:
     def _parse_jsonrpc_response(self, body: str, expected_key: str = None) -> Any:
         """Parse JSON-RPC response from SSE or plain JSON."""
         result = None
+        document: Any = _MISSING
 
-        for line in body.split('\n'):
-            line = line.strip()
-            if line.startswith('data:'):
-                try:
-                    data = json.loads(line[5:].strip())
-                    if 'error' in data:
-                        error = data['error']
-                        raise RuntimeError(f"JSON-RPC error: {error.get('message', str(error))}")
-                    if 'result' in data:
-                        result = data['result']
-                        if expected_key and isinstance(result, dict) and expected_key in result:
-                            return result[expected_key]
-                        elif not expected_key:
-                            return result
-                except json.JSONDecodeError:
-                    continue
+        # Plain JSON bodies are parsed first: valid JSON has no SSE "data:" lines to scan for
+        sniffed_json = body[:64].lstrip()[:1] == "{"
+        if sniffed_json:
+            try:
+                document = _json_loads(body)
+            except json.JSONDecodeError:
+                pass
 
-        try:
-            data = json.loads(body)
+        for match in _SSE_DATA_RE.finditer(body) if document is _MISSING else ():
+            try:
+                data = _json_loads(match.group(1).strip())
+                if 'error' in data:
+                    error = data['error']
+                    raise RuntimeError(f"JSON-RPC error: {error.get('message', str(error))}")
+                if 'result' in data:
+                    result = data['result']
+                    if expected_key and isinstance(result, dict) and expected_key in result:
+                        return result[expected_key]
+                    elif not expected_key:
+                        return result
+            except json.JSONDecodeError:
+                continue
+
+        if document is _MISSING and not sniffed_json:
+            try:
+                document = _json_loads(body)
+            except json.JSONDecodeError:
+                pass
+
+        if document is not _MISSING:
+            data = document
             if 'error' in data:
                 error = data['error']
                 raise RuntimeError(f"JSON-RPC error: {error.get('message', str(error))}")
@@ -1124,8 +1777,6 @@ Rules:
                 if expected_key and isinstance(result, dict) and expected_key in result:
                     return result[expected_key]
                 return result
-        except json.JSONDecodeError:
-            pass
 
         return result
 
@@ -1244,21 +1895,18 @@ Rules:
 
     async def _discover_http_tools(self) -> None:
         """Discover tools from all HTTP servers."""
-        for server_url in self.mcp_servers:
-            try:
-                assert self.http_client is not None
-                tools = None
-                protocol_used = None
-
-                self._log("INFO", "discovering_server", {"server": server_url})
-                tools = await self._discover_jsonrpc_tools(server_url)
+        # Probe servers concurrently; registry updates below stay serial and in server order
+        semaphore = asyncio.Semaphore(max(1, self.max_discovery_concurrency))
+        results = await asyncio.gather(
+            *(self._discover_http_server(server_url, semaphore) for server_url in self.mcp_servers),
+            return_exceptions=True,
+        )
 
-                if tools:
-                    protocol_used = "jsonrpc"
-                else:
-                    tools = await self._discover_rest_tools(server_url)
-                    if tools:
-                        protocol_used = "rest"
+        for server_url, outcome in zip(self.mcp_servers, results):
+            try:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                tools, protocol_used = outcome
 
                 if not tools:
                     self._log("WARNING", "no_tools_discovered", {"server": server_url})
@@ -1283,7 +1931,7 @@ Rules:
                     twm["_server_url"] = server_url
                     twm["_server_type"] = "http"
                     twm["_is_jsonrpc"] = is_jsonrpc
-                    self.tool_registry[t["name"]].append(twm)
+                    self._register_tool(server_url, twm)
 
                     constraint = self._parse_tool_constraints(t)
                     if constraint:
@@ -1303,6 +1951,19 @@ Rules:
             except Exception as e:
                 self._log("ERROR", "discovery_failed", {"server": server_url, "error": str(e)})
 
+    async def _discover_http_server(
+        self, server_url: str, semaphore: asyncio.Semaphore
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """Fetch one server's tools, JSON-RPC first, then REST: (tools, protocol used)."""
+        async with semaphore:
+            assert self.http_client is not None
+            self._log("INFO", "discovering_server", {"server": server_url})
+            tools = await self._discover_jsonrpc_tools(server_url)
+            if tools:
+                return tools, "jsonrpc"
+            tools = await self._discover_rest_tools(server_url)
+            return tools, "rest" if tools else None
+
     async def _discover_rest_tools(self, server_url: str) -> Optional[List[Dict[str, Any]]]:
         """Discover tools using REST API."""
         endpoints_to_try = [
@@ -1312,19 +1973,44 @@ Rules:
             f"{server_url.rstrip('/')}/tools",
         ]
 
-        for endpoint in endpoints_to_try:
-            try:
-                resp = await self.http_client.get(endpoint, timeout=10.0)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    tools = data.get("tools", []) if isinstance(data, dict) else data
-                    if tools and isinstance(tools, list):
-                        self._log("DEBUG", "rest_discovery_success", {"endpoint": endpoint, "tools_count": len(tools)})
-                        return tools
-            except Exception:
-                continue
+        def tools_from(resp: httpx.Response) -> Optional[List[Dict[str, Any]]]:
+            if resp.status_code != 200:
+                return None
+            data = _json_loads(resp.content)
+            tools = data.get("tools", []) if isinstance(data, dict) else data
+            return tools if tools and isinstance(tools, list) else None
 
-        return None
+        found = await self._probe_endpoints(endpoints_to_try, 10.0, tools_from)
+        if found is None:
+            return None
+        endpoint, tools = found
+        self._log("DEBUG", "rest_discovery_success", {"endpoint": endpoint, "tools_count": len(tools)})
+        return tools
+
+    async def _probe_endpoints(
+        self,
+        endpoints: List[str],
+        timeout: float,
+        accept: Callable[[httpx.Response], Any],
+    ) -> Optional[Tuple[str, Any]]:
+        """GET all endpoints at once; return the first in list order that ``accept`` maps to non-None.
+
+        Requests still in flight once the answer is known are cancelled.
+        """
+        tasks = [asyncio.ensure_future(self.http_client.get(endpoint, timeout=timeout)) for endpoint in endpoints]
+        try:
+            for endpoint, task in zip(endpoints, tasks):
+                try:
+                    value = accept(await task)
+                except Exception:
+                    continue
+                if value is not None:
+                    return endpoint, value
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     # -------------------------------------------------------------------------
     # Readiness Check
@@ -1348,15 +2034,9 @@ Rules:
                                 self._log("WARNING", "jsonrpc_server_not_ready", {"server": server_url, "attempt": attempt + 1})
                     else:
                         endpoints = [f"{normalized}/mcp/tools/list", f"{normalized}/tools/list"]
-                        ready = False
-                        for endpoint in endpoints:
-                            try:
-                                resp = await self.http_client.get(endpoint, timeout=5.0)
-                                if resp.status_code == 200:
-                                    ready = True
-                                    break
-                            except Exception:
-                                continue
+                        ready = await self._probe_endpoints(
+                            endpoints, 5.0, lambda resp: True if resp.status_code == 200 else None
+                        )
 
                         if not ready:
                             all_ready = False
@@ -1366,14 +2046,18 @@ Rules:
                     all_ready = False
                     self._log("WARNING", "server_readiness_error", {"server": server_url, "attempt": attempt + 1, "error": str(e)})
 
-            if all_ready:
-                for server_id, adapter in self.stdio_adapters.items():
-                    try:
-                        await adapter.get_tools()
-                    except Exception as e:
+            if all_ready and self.stdio_adapters:
+                # Separate processes: probe them all at once
+                adapters = list(self.stdio_adapters.items())
+                results = await asyncio.gather(
+                    *(adapter.get_tools() for _, adapter in adapters), return_exceptions=True
+                )
+                for (server_id, _), result in zip(adapters, results):
+                    if isinstance(result, Exception):
                         all_ready = False
-                        self._log("WARNING", "stdio_server_not_ready", {"server_id": server_id, "attempt": attempt + 1, "error": str(e)})
-                        break
+                        self._log("WARNING", "stdio_server_not_ready", {"server_id": server_id, "attempt": attempt + 1, "error": str(result)})
+                    elif isinstance(result, BaseException):
+                        raise result
 
             if all_ready:
                 self._log("INFO", "all_servers_ready", {"attempts": attempt + 1})
@@ -1389,7 +2073,58 @@ Rules:
     # Tool Execution
     # -------------------------------------------------------------------------
 
+    _TOOL_RESULT_CACHE_SIZE = 1024
+
+    def _is_cacheable_tool(self, tool: Dict[str, Any]) -> bool:
+        if self.tool_result_cache_ttl <= 0:
+            return False
+        if tool.get("name") in self.cacheable_tools:
+            return True
+        annotations = tool.get("annotations")
+        return isinstance(annotations, dict) and annotations.get("readOnlyHint") is True
+
     async def _execute_tool_internal(self, tool: Dict[str, Any], parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a tool, serving repeat calls to read-only tools from the result cache."""
+        server_url = tool.get("_server_url")
+        if not self._is_cacheable_tool(tool):
+            if self.tool_result_cache_ttl <= 0:
+                return await self._dispatch_tool(tool, parameters)
+            try:
+                return await self._dispatch_tool(tool, parameters)
+            finally:
+                # Read-only is not immutable: anything this call changed must be re-read
+                self._tool_cache_epochs[server_url] += 1
+
+        try:
+            epoch = self._tool_cache_epochs[server_url]
+            key = (server_url, epoch, tool.get("name"), _json_bytes(parameters, sort_keys=True))
+        except Exception:
+            return await self._dispatch_tool(tool, parameters)
+
+        cache = self._tool_result_cache
+        now = time.monotonic()
+        entry = cache.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                cache.move_to_end(key)
+                self._log("DEBUG", "tool_result_cache_hit", {"tool": key[2], "server": server_url})
+                # Stored serialized: every hit gets its own object, whatever earlier callers mutated
+                return _json_loads(entry[1])
+            del cache[key]
+
+        result = await self._dispatch_tool(tool, parameters)
+        if _is_error_payload(result):
+            return result
+        try:
+            payload = _json_bytes(result)
+        except Exception:
+            return result
+        cache[key] = (now + self.tool_result_cache_ttl, payload)
+        if len(cache) > self._TOOL_RESULT_CACHE_SIZE:
+            cache.popitem(last=False)
+        return result
+
+    async def _dispatch_tool(self, tool: Dict[str, Any], parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Execute a tool using the appropriate protocol."""
         server_url = tool.get("_server_url")
         server_type = tool.get("_server_type")
@@ -1402,11 +2137,13 @@ Rules:
             if normalized in self._jsonrpc_servers or tool.get("_is_jsonrpc"):
                 return await self._execute_jsonrpc_tool(server_url, tool_name, parameters)
             else:
-                base = MCPBaseURL.normalize(server_url)
-                invoke_url = base.invoke_url(tool_name)
+                invoke_url = self._invoke_urls.get((server_url, tool_name))
+                if invoke_url is None:
+                    invoke_url = MCPBaseURL.normalize(server_url).invoke_url(tool_name)
+                    self._invoke_urls[(server_url, tool_name)] = invoke_url
                 resp = await self.http_client.post(invoke_url, json=parameters, timeout=30.0)
                 resp.raise_for_status()
-                return resp.json()
+                return _json_loads(resp.content)
 
         if server_type == "stdio":
             adapter = self.stdio_adapters.get(server_url)
@@ -1430,6 +2167,14 @@ Rules:
     async def stop(self) -> None:
         self._log("INFO", "agent_stopping", {})
 
+        refresh_task, self._tools_refresh_task = self._tools_refresh_task, None
+        if refresh_task is not None and not refresh_task.done():
+            refresh_task.cancel()
+            try:
+                await refresh_task
+            except asyncio.CancelledError:
+                pass
+
         for client in self.stdio_clients.values():
             try:
                 await client.stop()
@@ -1446,12 +2191,22 @@ Rules:
 
         self.stdio_clients.clear()
         self.stdio_adapters.clear()
+        self._tool_result_cache.clear()
+        self._tool_cache_epochs.clear()
+        self._plan_cache.clear()
         self.stdio_tools_cache.clear()
         self.tool_registry.clear()
+        self._tool_index.clear()
         self.tool_constraints.clear()
         self._jsonrpc_sessions.clear()
+        self._invoke_urls.clear()
+        self._rate_limiter_keys.clear()
+        self._tools_refresh_locks.clear()
+        self._tools_refresh_loop = None
+        self._params_desc_cache.clear()
         self._jsonrpc_servers.clear()
         self._log("INFO", "agent_stopped", {})
+        self._stop_log_writer()
 
     async def __aenter__(self):
         await self.start()
@@ -1471,27 +2226,39 @@ Rules:
     # -------------------------------------------------------------------------
 
     def _classify_error(self, error: Exception, status_code: Optional[int] = None) -> ErrorType:
-        s = str(error).lower()
-        if "timeout" in s or isinstance(error, asyncio.TimeoutError):
+        if isinstance(error, asyncio.TimeoutError):
             return ErrorType.TIMEOUT
-        if status_code == 429 or "rate limit" in s:
-            return ErrorType.RATE_LIMIT
-        if status_code in {401, 403} or "unauthorized" in s or "auth" in s:
-            return ErrorType.AUTH
-        if status_code == 404 or "not found" in s:
-            return ErrorType.NOT_FOUND
-        if status_code == 400 or "schema" in s or "validation" in s:
-            return ErrorType.SCHEMA
-        if status_code and status_code >= 500:
-            return ErrorType.TRANSIENT
-        if any(x in s for x in ["connection", "network", "refused"]):
-            return ErrorType.TRANSIENT
-        return ErrorType.UNKNOWN
+        rank = _STATUS_ERROR_RANK.get(status_code, _RANK_UNKNOWN)
+        if rank == _RANK_UNKNOWN and status_code and status_code >= 500:
+            rank = _RANK_TRANSIENT
+        for match in _ERROR_KEYWORD_RE.finditer(str(error)):
+            keyword_rank = _KEYWORD_ERROR_RANK[match.lastgroup]
+            if keyword_rank < rank:
+                rank = keyword_rank
+                if rank == _RANK_TIMEOUT:
+                    break
+        return _ERROR_PRECEDENCE[rank]
 
     def _get_rate_limiter_keys(self, tool: Dict[str, Any]) -> Tuple[str, str]:
         server_key = tool.get("_server_url") or "unknown_server"
         tool_name = tool.get("name") or "unknown_tool"
-        return server_key, f"{server_key}::{tool_name}"
+        ident = (server_key, tool_name)
+        keys = self._rate_limiter_keys.get(ident)
+        if keys is None:
+            # Selection and execution look these up repeatedly per step; format them once per tool
+            keys = self._rate_limiter_keys[ident] = (server_key, f"{server_key}::{tool_name}")
+        return keys
+
+    def _rate_limit_wait(self, tool: Dict[str, Any]) -> float:
+        """Seconds until both of ``tool``'s limiters (server and tool) admit another call."""
+        if not self.enable_rate_limiting:
+            return 0.0
+        wait = 0.0
+        for key in self._get_rate_limiter_keys(tool):
+            limiter = self.rate_limiters.get(key)
+            if limiter is not None:
+                wait = max(wait, limiter.wait_time())
+        return wait
 
     def _ensure_tool_rate_limiter(self, tool: Dict[str, Any], calls: int, window: float) -> None:
         _, tool_key = self._get_rate_limiter_keys(tool)
@@ -1545,15 +2312,18 @@ Rules:
                 return AgentResult(status="error", error=f"Rate limit exceeded, wait {wt:.1f}s", error_type=ErrorType.RATE_LIMIT)
 
         schema = tool.get("input_schema") or tool.get("inputSchema") or {}
-        required_set = set(schema.get("required", []) or [])
+        required_set = SchemaValidator.required_parameters(schema)
 
-        if isinstance(parameters, dict):
+        # Rebuilt only when an optional parameter is None; the caller's dict is never mutated
+        if isinstance(parameters, dict) and any(
+            v is None and k not in required_set for k, v in parameters.items()
+        ):
             parameters = {k: v for k, v in parameters.items() if not (v is None and k not in required_set)}
 
         is_valid, error_msg, suggested_fix = SchemaValidator.validate_parameters(parameters, schema)
         if not is_valid:
             if suggested_fix and isinstance(suggested_fix, dict):
-                parameters.update(suggested_fix)
+                parameters = {**parameters, **suggested_fix}
                 is_valid, error_msg, _ = SchemaValidator.validate_parameters(parameters, schema)
             if not is_valid:
                 self._log("WARNING", "schema_validation_failed", {"tool": tool_name, "error": error_msg, "parameters": parameters})
@@ -1571,9 +2341,9 @@ Rules:
             self.budget.add_tool_call(1)
 
             try:
-                start_time = time.time()
+                start_time = time.monotonic()
                 result = await self._execute_tool_internal(tool, parameters)
-                latency = time.time() - start_time
+                latency = time.monotonic() - start_time
 
                 if metric_key in self.tool_metrics:
                     self.tool_metrics[metric_key].record_success(latency)
@@ -1585,13 +2355,17 @@ Rules:
                 if self.enable_rate_limiting and tool_limiter_key in self.rate_limiters:
                     self.rate_limiters[tool_limiter_key].record_call()
 
-                self.budget.add_payload(len(json.dumps(result, default=str)))
+                # Serialized once: the size also spares _compress_tool_output a re-serialization
+                payload_bytes = len(_json_bytes(result))
+                self.budget.add_payload(payload_bytes)
 
                 self._log("INFO", "tool_execution_success", {"tool": tool_name, "server": server_url, "latency": latency, "attempt": attempt + 1})
-                return AgentResult(status="success", result=result, latency=latency, metadata={"attempt": attempt + 1})
+                agent_result = AgentResult(status="success", result=result, latency=latency, metadata={"attempt": attempt + 1})
+                agent_result._payload_bytes = payload_bytes
+                return agent_result
 
             except Exception as e:
-                latency = time.time() - start_time if "start_time" in locals() else 0.0
+                latency = time.monotonic() - start_time if "start_time" in locals() else 0.0
                 last_error = e
 
                 status_code = getattr(e, "status_code", None) if hasattr(e, "status_code") else None
@@ -1616,7 +2390,7 @@ Rules:
 
                 if attempt < max_retries:
                     wait_time = self.retry_backoff * (2 ** attempt)
-                    jitter = wait_time * 0.1 * (2 * (hash(str(e)) % 100) / 100 - 1)
+                    jitter = random.uniform(-0.1, 0.1) * wait_time
                     wait_time = max(0.0, wait_time + jitter)
                     self._log("INFO", "tool_execution_retry", {"tool": tool_name, "attempt": attempt + 2, "wait_time": wait_time})
                     await asyncio.sleep(wait_time)
@@ -1632,37 +2406,34 @@ Rules:
     # Tool caches / Ranking
     # -------------------------------------------------------------------------
 
-    def _compress_tool_output(self, result: Dict[str, Any], max_size: int = 2000) -> Dict[str, Any]:
-        try:
-            result_str = json.dumps(result, default=str)
-        except Exception:
-            return {"_compressed": True, "error": "unserializable_result"}
+    @staticmethod
+    def _result_payload_size(res: AgentResult) -> Optional[int]:
+        """Serialized size of ``res.result`` recorded at execution time, if known."""
+        return res._payload_bytes if res.result else None
 
-        if len(result_str) <= max_size:
+    def _compress_tool_output(
+        self, result: Dict[str, Any], max_size: int = 2000, known_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Shrink ``result`` to roughly ``max_size`` serialized bytes.
+
+        ``known_size`` is the result's already-measured ``_json_bytes`` length, if any.
+        """
+        if known_size is not None:
+            original_size = known_size
+        else:
+            try:
+                original_size = len(_json_bytes(result))
+            except Exception:
+                return {"_compressed": True, "error": "unserializable_result"}
+
+        if original_size <= max_size:
             return result
 
         if not isinstance(result, dict):
-            return {"_compressed": True, "_original_size": len(result_str), "value": str(result)[:max_size]}
+            return {"_compressed": True, "_original_size": original_size, "value": str(result)[:max_size]}
 
         compressed: Dict[str, Any] = {}
-        priority_fields = [
-            "status",
-            "success",
-            "error",
-            "message",
-            "summary",
-            "content",
-            "messages",
-            "result",
-            "data",
-            "output",
-            "text",
-            "value",
-            "answer",
-            "final_answer",
-        ]
-
-        for field_name in priority_fields:
+        for field_name in _PRIORITY_FIELDS:
             if field_name not in result:
                 continue
             value = result[field_name]
@@ -1677,34 +2448,111 @@ Rules:
             elif isinstance(value, list):
                 compressed[field_name] = value[:10] + ([f"... +{len(value) - 10} more"] if len(value) > 10 else [])
             elif isinstance(value, dict):
-                nested_str = json.dumps(value, default=str)
-                compressed[field_name] = value if len(nested_str) <= 700 else "[object_truncated]"
+                compressed[field_name] = value if len(_json_bytes(value)) <= 700 else "[object_truncated]"
             else:
                 compressed[field_name] = value
 
         compressed["_compressed"] = True
-        compressed["_original_size"] = len(result_str)
+        compressed["_original_size"] = original_size
         return compressed
 
-    async def _refresh_stdio_tools_cache(self) -> None:
-        now = time.time()
-        for server_id, adapter in self.stdio_adapters.items():
-            if server_id in self.stdio_tools_cache:
-                _, ts = self.stdio_tools_cache[server_id]
-                if now - ts < self.tools_cache_ttl:
-                    continue
+    def _register_tool(self, server_id: str, tool: Dict[str, Any]) -> None:
+        """Add a server's tool to the registry, indexed by (server id, name); re-listed tools replace theirs."""
+        key = (sys.intern(server_id), tool["name"])
+        previous = self._tool_index.get(key)
+        self._tool_index[key] = tool
+        entries = self.tool_registry[tool["name"]]
+        if previous is None:
+            entries.append(tool)
+            return
+        for i, entry in enumerate(entries):
+            if entry is previous:
+                entries[i] = tool
+                break
+
+    def _start_tools_refresh(self) -> None:
+        """Prewarm stdio tool lists in the background so _get_all_tools rarely has to list inline."""
+        if not self.stdio_adapters or self.tools_cache_ttl <= 0:
+            return
+        if self._tools_refresh_task is None or self._tools_refresh_task.done():
+            self._tools_refresh_task = asyncio.ensure_future(self._refresh_tools_periodically())
 
+    async def _refresh_tools_periodically(self) -> None:
+        interval = max(self.tools_cache_ttl / 2, 1.0)
+        while True:
             try:
-                tools = await adapter.get_tools()
-                self.stdio_tools_cache[server_id] = (tools, now)
+                # Relist whatever would expire before the next tick, so readers never see an expired entry
+                await self._refresh_stdio_tools_cache(horizon=interval)
+            except Exception as e:
+                self._log("ERROR", "stdio_cache_refresh_failed", {"error": str(e)})
+            await asyncio.sleep(interval)
+
+    def invalidate_tools_cache(self) -> None:
+        """Drop cached stdio tool lists; the next tool lookup lists them again."""
+        self.stdio_tools_cache.clear()
+
+    def _stdio_tools_stale(self, server_id: str, horizon: float = 0.0, missing_only: bool = False) -> bool:
+        entry = self.stdio_tools_cache.get(server_id)
+        if entry is None:
+            return True
+        return not missing_only and time.monotonic() - entry[1] + horizon >= self.tools_cache_ttl
+
+    def _tools_refresh_lock(self, server_id: str) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._tools_refresh_loop is not loop:
+            # asyncio locks belong to one loop, and the sync run() uses a new loop per call
+            self._tools_refresh_locks = {}
+            self._tools_refresh_loop = loop
+        lock = self._tools_refresh_locks.get(server_id)
+        if lock is None:
+            lock = self._tools_refresh_locks[server_id] = asyncio.Lock()
+        return lock
+
+    async def _list_stdio_tools(
+        self, server_id: str, adapter: Any, horizon: float, missing_only: bool
+    ) -> Optional[List[Dict[str, Any]]]:
+        """List one server's tools under its lock; None if another refresher already did."""
+        async with self._tools_refresh_lock(server_id):
+            if not self._stdio_tools_stale(server_id, horizon, missing_only):
+                return None
+            tools = await adapter.get_tools()
+            self.stdio_tools_cache[server_id] = (tools, time.monotonic())
+            return tools
+
+    async def _refresh_stdio_tools_cache(self, horizon: float = 0.0, missing_only: bool = False) -> None:
+        """Relist stdio servers whose tools are missing or expire within ``horizon`` seconds.
+
+        With ``missing_only``, only servers that were never listed (or were invalidated) are fetched.
+        """
+        stale = [
+            (server_id, adapter)
+            for server_id, adapter in self.stdio_adapters.items()
+            if self._stdio_tools_stale(server_id, horizon, missing_only)
+        ]
+        if not stale:
+            return
+
+        # Each server is a separate process: list them concurrently, then register in order
+        results = await asyncio.gather(
+            *(self._list_stdio_tools(server_id, adapter, horizon, missing_only) for server_id, adapter in stale),
+            return_exceptions=True,
+        )
 
+        for (server_id, _), tools in zip(stale, results):
+            if isinstance(tools, Exception):
+                self._log("ERROR", "stdio_cache_refresh_failed", {"server_id": server_id, "error": str(tools)})
+                continue
+            if isinstance(tools, BaseException):
+                raise tools
+            if tools is None:
+                continue
+            try:
                 for t in tools:
                     twm = dict(t)
                     twm["_server_url"] = server_id
                     twm["_server_type"] = "stdio"
 
-                    if twm not in self.tool_registry[t["name"]]:
-                        self.tool_registry[t["name"]].append(twm)
+                    self._register_tool(server_id, twm)
 
                     constraint = self._parse_tool_constraints(t)
                     if constraint:
@@ -1717,26 +2565,30 @@ Rules:
             except Exception as e:
                 self._log("ERROR", "stdio_cache_refresh_failed", {"server_id": server_id, "error": str(e)})
 
-    async def _get_all_tools(self) -> List[Dict[str, Any]]:
-        all_tools: List[Dict[str, Any]] = []
+    async def _get_all_tools(
+        self, top_k: Optional[int] = None, exclude: FrozenSet[str] = frozenset()
+    ) -> List[Dict[str, Any]]:
+        """Usable tools, best-ranked first; only the first ``top_k`` when given, minus ``exclude`` names."""
+        http_tools: List[Dict[str, Any]] = []
+        stdio_tools: List[Dict[str, Any]] = []
         tools_seen: Set[Tuple[str, str]] = set()
 
         for server_url, tools in (self.http_tools_cache or {}).items():
             if self.enable_health_checks and server_url in self.server_health and not self.server_health[server_url].can_use():
                 continue
 
+            # Per-server, not per-tool
+            is_jsonrpc = self._normalize_server_url(server_url) in self._jsonrpc_servers
+
             for t in tools:
+                if exclude and t["name"] in exclude:
+                    continue
                 dedup_key = (server_url, t["name"])
                 if dedup_key in tools_seen:
                     continue
                 tools_seen.add(dedup_key)
 
-                twm = dict(t)
-                twm["_server_url"] = server_url
-                twm["_server_type"] = "http"
-
-                normalized = self._normalize_server_url(server_url)
-                twm["_is_jsonrpc"] = normalized in self._jsonrpc_servers
+                twm = {**t, "_server_url": server_url, "_server_type": "http", "_is_jsonrpc": is_jsonrpc}
 
                 metric_key = f"{server_url}:{t['name']}"
                 if metric_key in self.tool_metrics:
@@ -1744,23 +2596,26 @@ Rules:
                     twm["_success_rate"] = m.success_rate()
                     twm["_avg_latency"] = m.avg_latency()
 
-                all_tools.append(twm)
+                http_tools.append(twm)
 
-        await self._refresh_stdio_tools_cache()
+        # While the background task runs it is the only refresher: list inline just servers it has not reached.
+        # Without it (not started, or the sync run() loop that owned it has closed), relist expired entries here.
+        refresh_task = self._tools_refresh_task
+        await self._refresh_stdio_tools_cache(missing_only=refresh_task is not None and not refresh_task.done())
 
         for server_id, (tools, _) in self.stdio_tools_cache.items():
             if self.enable_health_checks and server_id in self.server_health and not self.server_health[server_id].can_use():
                 continue
 
             for t in tools:
+                if exclude and t["name"] in exclude:
+                    continue
                 dedup_key = (server_id, t["name"])
                 if dedup_key in tools_seen:
                     continue
                 tools_seen.add(dedup_key)
 
-                twm = dict(t)
-                twm["_server_url"] = server_id
-                twm["_server_type"] = "stdio"
+                twm = {**t, "_server_url": server_id, "_server_type": "stdio"}
 
                 metric_key = f"{server_id}:{t['name']}"
                 if metric_key in self.tool_metrics:
@@ -1768,10 +2623,16 @@ Rules:
                     twm["_success_rate"] = m.success_rate()
                     twm["_avg_latency"] = m.avg_latency()
 
-                all_tools.append(twm)
+                stdio_tools.append(twm)
 
-        all_tools.sort(key=lambda t: (-t.get("_success_rate", 0.5), t.get("_avg_latency", 9999.0), t.get("name", "")))
-        return all_tools
+        # Rank each transport's tools, then merge (stable: http first on ties)
+        http_tools = _rank_tools(http_tools, top_k)
+        stdio_tools = _rank_tools(stdio_tools, top_k)
+        if not stdio_tools:
+            return http_tools[:top_k] if top_k is not None else http_tools
+        if not http_tools:
+            return stdio_tools[:top_k] if top_k is not None else stdio_tools
+        return list(islice(heapq.merge(http_tools, stdio_tools, key=_tool_rank_key), top_k))
 
     def _value_has_meaningful_content(self, value: Any, max_depth: int = 4) -> bool:
         if max_depth <= 0:
@@ -1787,12 +2648,8 @@ Rules:
         if isinstance(value, dict):
             if not value:
                 return False
-            ignorable = {
-                "status", "success", "ok", "latency", "duration", "metadata",
-                "_compressed", "_original_size"
-            }
             for k, v in value.items():
-                if str(k).lower() in ignorable:
+                if str(k).lower() in _IGNORABLE_KEYS:
                     continue
                 if self._value_has_meaningful_content(v, max_depth - 1):
                     return True
@@ -1803,21 +2660,9 @@ Rules:
         if not isinstance(result, dict) or not result:
             return "no data"
 
-        key_hints = [
-            ("content", "content"),
-            ("result", "result"),
-            ("data", "data"),
-            ("message", "message"),
-            ("messages", "messages"),
-            ("text", "text"),
-            ("output", "output"),
-            ("value", "value"),
-            ("answer", "answer"),
-            ("final_answer", "final_answer"),
-        ]
-        for key, label in key_hints:
+        for key in _SIGNAL_FIELDS:
             if key in result and self._value_has_meaningful_content(result.get(key)):
-                return f"has {label}"
+                return f"has {key}"
 
         if self._value_has_meaningful_content(result):
             return "has output"
@@ -1829,7 +2674,7 @@ Rules:
             return ""
 
         if isinstance(value, str):
-            compact = re.sub(r"\s+", " ", value).strip()
+            compact = _WS_RE.sub(" ", value).strip()
             if not compact:
                 return ""
             return compact if len(compact) <= max_chars else compact[:max_chars] + "..."
@@ -1856,25 +2701,14 @@ Rules:
                 if text_preview:
                     return text_preview
 
-            preferred_keys = (
-                "final_answer",
-                "answer",
-                "content",
-                "result",
-                "data",
-                "output",
-                "value",
-                "message",
-                "text",
-            )
-            for key in preferred_keys:
+            for key in _PREVIEW_FIELDS:
                 if key in value:
                     chunk = self._value_preview_text(value.get(key), max_depth=max_depth - 1, max_chars=max_chars)
                     if chunk:
                         return chunk
 
             for key, child in value.items():
-                if str(key).lower() in {"status", "success", "ok", "latency", "duration", "metadata"}:
+                if str(key).lower() in _METADATA_KEYS:
                     continue
                 chunk = self._value_preview_text(child, max_depth=max_depth - 1, max_chars=max_chars)
                 if chunk:
@@ -1889,12 +2723,26 @@ Rules:
         compressed = self._compress_tool_output(safe, max_size=800)
         return self._value_preview_text(compressed, max_depth=4, max_chars=max_chars)
 
+    def _action_preview_text(self, res: AgentResult, max_chars: int = 180) -> str:
+        """Like _result_preview_text, memoized on the result (the validator re-reads the same actions each step)."""
+        preview = res._previews.get(max_chars)
+        if preview is not None:
+            return preview
+        if not isinstance(res.result, dict) or not res.result:
+            return ""
+        redacted = res.redacted_result()
+        known_size = self._result_payload_size(res) if redacted is res.result else None
+        compressed = self._compress_tool_output(redacted, max_size=800, known_size=known_size)
+        preview = res._previews[max_chars] = self._value_preview_text(compressed, max_depth=4, max_chars=max_chars)
+        return preview
+
     @staticmethod
     def _response_mentions_key_preview(response_text: str, key_previews: List[str]) -> bool:
         if not response_text or not key_previews:
             return False
 
         response_lower = response_text.lower()
+        response_tokens: Optional[FrozenSet[str]] = None
         for preview in key_previews:
             if not preview:
                 continue
@@ -1905,21 +2753,48 @@ Rules:
                 return True
 
             # Token overlap coverage for paraphrased responses
-            tokens = [t for t in re.findall(r"[a-z0-9][a-z0-9._-]{2,}", preview_lower) if len(t) >= 4]
+            tokens = _OVERLAP_TOKEN_RE.findall(preview_lower)
             if not tokens:
                 continue
 
-            overlap = sum(1 for t in tokens if t in response_lower)
-            if overlap >= min(2, len(tokens)):
-                return True
+            if response_tokens is None:
+                response_tokens = frozenset(_OVERLAP_TOKEN_RE.findall(response_lower))
+            # Whole-token hits are a set probe; only the rest need a substring scan
+            needed = min(2, len(tokens))
+            overlap = 0
+            for t in tokens:
+                if t in response_tokens or t in response_lower:
+                    overlap += 1
+                    if overlap >= needed:
+                        return True
 
         return False
 
     # =========================================================================
-    # FIXED PLANNER & VALIDATOR
+    # LLM CALLS
     # =========================================================================
 
-    async def _create_plan(self, user_message: str, action_history: Optional[List[Dict[str, Any]]] = None) -> Optional[List[Dict[str, Any]]]:
+    def _llm_generate(self, prompt: str, system: str = "") -> str:
+        """Single provider round-trip with token budget accounting."""
+        self.budget.add_tokens(TokenEstimator.estimate_prompt_tokens(prompt, system))
+        resp = self.llm_provider.generate(prompt).strip()
+        self.budget.add_tokens(TokenEstimator.estimate_tokens(resp))
+        return resp
+
+    async def _llm_generate_async(self, prompt: str, system: str = "") -> str:
+        """Run the blocking provider call off the event loop."""
+        return await self._run_blocking(self._llm_generate, prompt, system)
+
+    async def _run_blocking(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run ``fn(*args)``, which may make a provider call, in the default executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    # =========================================================================
+    # FIXED PLANNER & VALIDATOR
+    # =========================================================================
+
+    async def _create_plan(self, user_message: str, action_history: Optional[List[AgentAction]] = None) -> Optional[List[Dict[str, Any]]]:
         """
         Create plan with feedback from action history.
         
@@ -1935,6 +2810,17 @@ Rules:
             self._log("WARNING", "no_tools_for_planner", {})
             return None
 
+        # Only first plans are cached: re-plans depend on the feedback below
+        plan_key: Optional[Tuple[str, FrozenSet[str]]] = None
+        plan_vector: Optional[Tuple[float, ...]] = None
+        if self.plan_cache_size and not action_history:
+            plan_key = (" ".join(user_message.lower().split()), frozenset(t.get("name") for t in available_tools))
+            cached_plan, plan_vector = await self._lookup_cached_plan(user_message, plan_key)
+            if cached_plan is not None:
+                self._log("INFO", "plan_cache_hit", {"steps": len(cached_plan), "plan": cached_plan})
+                self._plan_failures = 0
+                return cached_plan
+
         tools_section = self._build_tools_list_for_planner(available_tools)
 
         # ✅ FIX: Add feedback from previous actions
@@ -1943,14 +2829,14 @@ Rules:
             last_actions = action_history[-3:]
             feedback_lines = []
             for a in last_actions:
-                r: AgentResult = a["result"]
+                r: AgentResult = a.result
                 status = "✓" if r.is_success() else "✗"
                 # Include actual content preview OR error message
                 result_preview = ""
                 if r.is_success():
                     if r.result and isinstance(r.result, dict):
                         signal = self._result_signal_label(r.result)
-                        preview = self._result_preview_text(r.result, max_chars=120)
+                        preview = self._action_preview_text(r, max_chars=120)
                         if preview:
                             result_preview = f" ({signal}; preview: {preview})"
                         else:
@@ -1960,7 +2846,7 @@ Rules:
                     if r.error:
                         result_preview = f" ERROR: {r.error[:150]}"
                 
-                feedback_lines.append(f"{status} {a['tool']}{result_preview}")
+                feedback_lines.append(f"{status} {a.tool}{result_preview}")
             
             feedback = f"\n\nRECENT RESULTS:\n" + "\n".join(feedback_lines)
 
@@ -1980,15 +2866,15 @@ Create SHORT plan (2-4 steps) considering what already happened.
 JSON only:"""
 
         try:
-            self.budget.add_tokens(TokenEstimator.estimate_tokens(prompt))
-            resp = self.llm_provider.generate(prompt).strip()
-            self.budget.add_tokens(TokenEstimator.estimate_tokens(resp))
+            resp = await self._llm_generate_async(prompt, self.PLANNER_SYSTEM)
             
             parsed = self._extract_first_json_object(resp)
             if parsed and isinstance(parsed.get("plan"), list):
                 plan = parsed["plan"]
                 self._log("INFO", "plan_created", {"steps": len(plan), "plan": plan})
                 self._plan_failures = 0  # Reset failure counter
+                if plan_key is not None:
+                    self._store_cached_plan(plan_key, plan_vector, plan)
                 return plan
             
             return None
@@ -1997,6 +2883,59 @@ JSON only:"""
             self._log("ERROR", "planning_failed", {"error": str(e)})
             return None
 
+    @staticmethod
+    def _copy_plan(plan: List[Any]) -> List[Any]:
+        return [dict(step) if isinstance(step, dict) else step for step in plan]
+
+    async def _embed_plan_request(self, user_message: str) -> Any:
+        """Call plan_embedding_fn without blocking the event loop (async callables are awaited)."""
+        embed = self.plan_embedding_fn
+        if asyncio.iscoroutinefunction(embed):
+            return await embed(user_message)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, embed, user_message)
+
+    async def _lookup_cached_plan(
+        self, user_message: str, key: Tuple[str, FrozenSet[str]]
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[Tuple[float, ...]]]:
+        """Cached plan for ``key`` (or a similar request over the same tools) and the request's embedding."""
+        cache = self._plan_cache
+        entry = cache.get(key)
+        if entry is not None:
+            cache.move_to_end(key)
+            return self._copy_plan(entry[1]), entry[0]
+        if self.plan_embedding_fn is None:
+            return None, None
+
+        try:
+            vector = _unit_vector(await self._embed_plan_request(user_message))
+        except Exception as e:
+            self._log("WARNING", "plan_embedding_failed", {"error": str(e)})
+            return None, None
+        if vector is None:
+            return None, None
+
+        best_key = None
+        best_similarity = self.plan_cache_similarity
+        for other_key, (other_vector, _) in cache.items():
+            if other_vector is None or other_key[1] != key[1] or len(other_vector) != len(vector):
+                continue
+            similarity = sum(a * b for a, b in zip(vector, other_vector))
+            if similarity >= best_similarity:
+                best_key, best_similarity = other_key, similarity
+        if best_key is None:
+            return None, vector
+        cache.move_to_end(best_key)
+        return self._copy_plan(cache[best_key][1]), vector
+
+    def _store_cached_plan(
+        self, key: Tuple[str, FrozenSet[str]], vector: Optional[Tuple[float, ...]], plan: List[Dict[str, Any]]
+    ) -> None:
+        self._plan_cache[key] = (vector, self._copy_plan(plan))
+        self._plan_cache.move_to_end(key)
+        while len(self._plan_cache) > self.plan_cache_size:
+            self._plan_cache.popitem(last=False)
+
     async def _get_tools_for_planner(self, user_message: str, max_tools: int = 50) -> List[Dict[str, Any]]:
         """
         Get relevant tools for the planner.
@@ -2004,27 +2943,27 @@ JSON only:"""
         ✅ FIX: Default increased to 50 tools (was 30)
         ✅ FIX: Filters out management tools unless explicitly needed
         """
-        all_tools = await self._get_all_tools()
-        
         # ✅ FIX: Filter out management/control tools unless user explicitly asks for them
         # These tools are for advanced workflows, not typical tasks
-        management_tools = {"browser_tabs", "browser_console"}
-        needs_tabs = any(keyword in user_message.lower() for keyword in ["tab", "tabs", "multiple", "separate"])
+        management_tools = _PLANNER_MANAGEMENT_TOOLS
+        message_lower = user_message.lower()
+        needs_tabs = any(keyword in message_lower for keyword in ("tab", "tabs", "multiple", "separate"))
         
+        all_tools: List[Dict[str, Any]] = []
         if not needs_tabs:
             # User didn't ask for tabs explicitly - filter them out
-            filtered_tools = [t for t in all_tools if t.get("name") not in management_tools]
-            if filtered_tools:
-                all_tools = filtered_tools
+            all_tools = await self._get_all_tools(top_k=max_tools, exclude=management_tools)
+            if all_tools:
                 self._log("DEBUG", "filtered_management_tools", {
                     "reason": "task doesn't require multi-tab management",
                     "filtered": list(management_tools)
                 })
         
-        if len(all_tools) <= max_tools:
-            return all_tools
+        if not all_tools:
+            # Nothing but management tools (or the task asks for tabs): rank everything
+            all_tools = await self._get_all_tools(top_k=max_tools)
 
-        return all_tools[:max_tools]
+        return all_tools
     
     def _build_tools_list_for_planner(self, tools: List[Dict[str, Any]]) -> str:
         """Build compact tools list for planner prompt."""
@@ -2046,7 +2985,7 @@ JSON only:"""
     async def _validate_goal_achieved(
         self,
         user_message: str,
-        action_history: List[Dict[str, Any]]
+        action_history: List[AgentAction]
     ) -> Tuple[bool, float, Optional[str]]:
         """
         Validate goal achievement with content awareness.
@@ -2060,23 +2999,23 @@ JSON only:"""
         # ✅ FIX: Include actual content in validation
         results_summary = []
         for action in action_history[-10:]:  # ✅ FIX: More context (was 5)
-            r: AgentResult = action["result"]
+            r: AgentResult = action.result
             
             if r.is_success():
                 # ✅ FIX: Check if result has meaningful content
                 if r.result and isinstance(r.result, dict):
                     output_signal = self._result_signal_label(r.result)
-                    preview = self._result_preview_text(r.result, max_chars=180)
+                    preview = self._action_preview_text(r, max_chars=180)
                     if preview:
                         results_summary.append(
-                            f"- {action['tool']}: success ({output_signal}); preview: {preview}"
+                            f"- {action.tool}: success ({output_signal}); preview: {preview}"
                         )
                     else:
-                        results_summary.append(f"- {action['tool']}: success ({output_signal})")
+                        results_summary.append(f"- {action.tool}: success ({output_signal})")
                 else:
-                    results_summary.append(f"- {action['tool']}: success (no data)")
+                    results_summary.append(f"- {action.tool}: success (no data)")
             else:
-                results_summary.append(f"- {action['tool']}: FAILED - {r.error}")
+                results_summary.append(f"- {action.tool}: FAILED - {r.error}")
         
         results_block = "\n".join(results_summary)
 
@@ -2093,9 +3032,7 @@ Empty output means the action didn't actually work!
 JSON only:"""
 
         try:
-            self.budget.add_tokens(TokenEstimator.estimate_tokens(prompt))
-            resp = self.llm_provider.generate(prompt).strip()
-            self.budget.add_tokens(TokenEstimator.estimate_tokens(resp))
+            resp = await self._llm_generate_async(prompt, self.VALIDATOR_SYSTEM)
 
             parsed = self._extract_first_json_object(resp) or {}
             achieved = bool(parsed.get("achieved", False))
@@ -2122,35 +3059,36 @@ JSON only:"""
             return value
         return str(value)
 
-    def _make_call_signature(self, tool_name: str, parameters: Dict[str, Any]) -> str:
+    # Signatures are only compared in-process: raw 16-byte BLAKE2b digests, no hex encoding
+    def _make_call_signature(self, tool_name: str, parameters: Dict[str, Any]) -> bytes:
         normalized = self._normalize_for_fingerprint(parameters or {})
-        payload = json.dumps({"tool": tool_name, "params": normalized}, sort_keys=True, default=str)
-        return hashlib.md5(payload.encode("utf-8")).hexdigest()
+        payload = _json_bytes({"tool": tool_name, "params": normalized}, sort_keys=True)
+        return hashlib.blake2b(payload, digest_size=16).digest()
 
-    def _make_result_signature(self, result: AgentResult) -> str:
+    def _make_result_signature(self, result: AgentResult) -> bytes:
         if not result.is_success():
-            payload = json.dumps(
-                {"status": "error", "error": (result.error or "").strip()[:300]},
-                sort_keys=True,
-                default=str,
-            )
-            return hashlib.md5(payload.encode("utf-8")).hexdigest()
+            payload = _json_bytes({"status": "error", "error": (result.error or "").strip()[:300]}, sort_keys=True)
+            return hashlib.blake2b(payload, digest_size=16).digest()
 
-        normalized_result = self._normalize_for_fingerprint(self._compress_tool_output(result.result or {}, max_size=600))
-        payload = json.dumps({"status": "success", "result": normalized_result}, sort_keys=True, default=str)
-        return hashlib.md5(payload.encode("utf-8")).hexdigest()
+        compact = self._compress_tool_output(
+            result.result or {}, max_size=600, known_size=self._result_payload_size(result)
+        )
+        normalized_result = self._normalize_for_fingerprint(compact)
+        payload = _json_bytes({"status": "success", "result": normalized_result}, sort_keys=True)
+        return hashlib.blake2b(payload, digest_size=16).digest()
 
     def _mark_tool_cooldown(self, tool_name: str, current_step: int) -> None:
         self._tool_cooldowns[tool_name] = current_step + max(1, int(self.tool_cooldown_steps))
 
+    def _sweep_cooldowns(self, current_step: int) -> None:
+        """Drop cooldowns released by ``current_step`` (once per step, so lookups stay read-only)."""
+        cooldowns = self._tool_cooldowns
+        if cooldowns:
+            for name in [name for name, release_step in cooldowns.items() if release_step <= current_step]:
+                del cooldowns[name]
+
     def _is_tool_on_cooldown(self, tool_name: str, current_step: int) -> bool:
-        release_step = self._tool_cooldowns.get(tool_name)
-        if release_step is None:
-            return False
-        if current_step >= release_step:
-            self._tool_cooldowns.pop(tool_name, None)
-            return False
-        return True
+        return self._tool_cooldowns.get(tool_name, current_step) > current_step
 
     def _update_loop_guard(
         self,
@@ -2190,10 +3128,19 @@ JSON only:"""
             "hard_stall": hard_stall,
         }
 
+    def _server_usable(self, server_url: Optional[str]) -> bool:
+        if self.enable_rate_limiting and server_url in self.rate_limiters:
+            if not self.rate_limiters[server_url].can_call():
+                return False
+        if self.enable_health_checks and server_url in self.server_health:
+            if not self.server_health[server_url].can_use():
+                return False
+        return True
+
     def _select_tool_with_constraints(
         self,
         all_tools: List[Dict[str, Any]],
-        action_history: List[Dict[str, Any]],
+        action_history: List[AgentAction],
         plan_step: Optional[Dict[str, Any]] = None,
         current_step: int = 0,
     ) -> Optional[Dict[str, Any]]:
@@ -2207,15 +3154,19 @@ JSON only:"""
         ✅ FIX: Avoids unnecessary browser_tabs when not needed
         """
         valid_tools: List[Dict[str, Any]] = []
-        executed_tools = {a["tool"] for a in action_history}
+        executed_tools = {a.tool for a in action_history}
+        constraints = self.tool_constraints
+        check_cooldowns = self.never_stuck_mode and bool(self._tool_cooldowns)
+        # Rate limit and circuit state are per server: evaluate each server once, not per tool
+        server_usable: Dict[Any, bool] = {}
 
         # Apply constraints
         for tool in all_tools:
             tool_name = tool["name"]
             server_url = tool.get("_server_url")
 
-            if tool_name in self.tool_constraints:
-                c = self.tool_constraints[tool_name]
+            c = constraints.get(tool_name)
+            if c is not None:
 
                 if c.type == ToolConstraintType.REQUIRES_PREVIOUS and c.requires:
                     if not all(req in executed_tools for req in c.requires):
@@ -2237,15 +3188,13 @@ JSON only:"""
                         if not self.rate_limiters[tool_limiter_key].can_call():
                             continue
 
-            if self.enable_rate_limiting and server_url in self.rate_limiters:
-                if not self.rate_limiters[server_url].can_call():
-                    continue
-
-            if self.enable_health_checks and server_url in self.server_health:
-                if not self.server_health[server_url].can_use():
-                    continue
+            usable = server_usable.get(server_url)
+            if usable is None:
+                usable = server_usable[server_url] = self._server_usable(server_url)
+            if not usable:
+                continue
 
-            if self.never_stuck_mode and self._is_tool_on_cooldown(tool_name, current_step):
+            if check_cooldowns and self._is_tool_on_cooldown(tool_name, current_step):
                 continue
 
             valid_tools.append(tool)
@@ -2257,19 +3206,22 @@ JSON only:"""
         if plan_step and plan_step.get("tool_hint") and self.planning_mode != PlanningMode.OFF:
             hint = plan_step["tool_hint"]
             
-            # 1. Try exact match (case-sensitive)
+            # 1. Exact match (case-sensitive) wins anywhere in the list;
+            # 2. ✅ FIX: otherwise the first fuzzy match (case-insensitive, substring).
+            # One pass: names are lowercased only until the first fuzzy candidate is found
+            hint_lower = hint.lower()
+            fuzzy_match: Optional[Dict[str, Any]] = None
             for t in valid_tools:
                 if t["name"] == hint:
                     self._log("DEBUG", "plan_hint_exact_match", {"tool": hint})
                     return t
-            
-            # 2. ✅ FIX: Try fuzzy match (case-insensitive, substring)
-            hint_lower = hint.lower()
-            for t in valid_tools:
-                tool_name_lower = t["name"].lower()
-                if hint_lower in tool_name_lower or tool_name_lower in hint_lower:
-                    self._log("INFO", "plan_hint_fuzzy_match", {"hint": hint, "matched": t["name"]})
-                    return t
+                if fuzzy_match is None:
+                    tool_name_lower = t["name"].lower()
+                    if hint_lower in tool_name_lower or tool_name_lower in hint_lower:
+                        fuzzy_match = t
+            if fuzzy_match is not None:
+                self._log("INFO", "plan_hint_fuzzy_match", {"hint": hint, "matched": fuzzy_match["name"]})
+                return fuzzy_match
             
             # 3. ✅ FIX: Tool hint not found - LOG and use fallback
             if self.planning_mode == PlanningMode.STRICT:
@@ -2285,7 +3237,7 @@ JSON only:"""
         # This prevents infinite loops on tools like browser_wait_for
         if not plan_step and len(action_history) > 2:
             # No plan and we've already done a few actions - be more selective
-            last_tool = action_history[-1]["tool"] if action_history else None
+            last_tool = action_history[-1].tool if action_history else None
             
             # Avoid repeating the same tool without parameters
             filtered_tools = []
@@ -2315,7 +3267,7 @@ JSON only:"""
 
         # ✅ FIX: Avoid unnecessary browser_tabs when other browser actions don't need them
         # Playwright MCP uses a default tab, so browser_tabs is only needed for explicit multi-tab workflows
-        last_tools = [a["tool"] for a in action_history[-3:]] if action_history else []
+        last_tools = [a.tool for a in action_history[-3:]] if action_history else []
         
         # If we just did browser_navigate/snapshot/screenshot, DON'T follow with browser_tabs
         avoid_tabs = False
@@ -2335,7 +3287,7 @@ JSON only:"""
 
         # Never-stuck mode: avoid immediate same-tool repetition when alternatives exist
         if self.never_stuck_mode and action_history and len(valid_tools) > 1:
-            last_tool = action_history[-1]["tool"]
+            last_tool = action_history[-1].tool
             if valid_tools[0]["name"] == last_tool:
                 for candidate in valid_tools[1:]:
                     if candidate["name"] != last_tool:
@@ -2350,16 +3302,10 @@ JSON only:"""
     # =========================================================================
 
     def _are_results_identical(self, result1: Dict[str, Any], result2: Dict[str, Any]) -> bool:
-        def normalize(obj: Any) -> Any:
-            if isinstance(obj, dict):
-                return {k: normalize(v) for k, v in sorted(obj.items())}
-            if isinstance(obj, list):
-                return [normalize(x) for x in obj]
-            return obj
+        # Dict equality already ignores key order: no sorted copies of either tree
+        return result1 is result2 or result1 == result2
 
-        return normalize(result1) == normalize(result2)
-
-    def _should_stop(self, action_history: List[Dict[str, Any]], user_message: str) -> Tuple[bool, Optional[str]]:
+    def _should_stop(self, action_history: List[AgentAction], user_message: str) -> Tuple[bool, Optional[str]]:
         if self._cancellation_token.is_set():
             return True, "Execution cancelled by user"
 
@@ -2372,7 +3318,7 @@ JSON only:"""
 
         consecutive_failures = 0
         for a in reversed(action_history):
-            if not a["result"].is_success():
+            if not a.result.is_success():
                 consecutive_failures += 1
             else:
                 break
@@ -2414,13 +3360,13 @@ JSON only:"""
 
             if expected_type == "integer":
                 if isinstance(value, str):
-                    cleaned = re.sub(r"[^\d.-]", "", value)
+                    cleaned = _NUM_CLEAN_RE.sub("", value)
                     return int(float(cleaned)) if cleaned else None
                 return int(value)
 
             if expected_type == "number":
                 if isinstance(value, str):
-                    cleaned = re.sub(r"[^\d.-]", "", value)
+                    cleaned = _NUM_CLEAN_RE.sub("", value)
                     return float(cleaned) if cleaned else None
                 return float(value)
 
@@ -2429,9 +3375,9 @@ JSON only:"""
                     return value
                 if isinstance(value, str):
                     v = value.strip().lower()
-                    if v in {"true", "yes", "y", "1", "on", "enabled"}:
+                    if v in _BOOL_TRUE:
                         return True
-                    if v in {"false", "no", "n", "0", "off", "disabled"}:
+                    if v in _BOOL_FALSE:
                         return False
                 return None
 
@@ -2440,7 +3386,7 @@ JSON only:"""
                     return value
                 if isinstance(value, str):
                     try:
-                        parsed = json.loads(value)
+                        parsed = _json_loads(value)
                         if isinstance(parsed, list):
                             return parsed
                     except Exception:
@@ -2458,7 +3404,7 @@ JSON only:"""
                     return value
                 if isinstance(value, str):
                     try:
-                        parsed = json.loads(value)
+                        parsed = _json_loads(value)
                         return parsed if isinstance(parsed, dict) else None
                     except Exception:
                         return None
@@ -2488,26 +3434,66 @@ JSON only:"""
 
         return {k: v for k, v in cleaned.items() if k in required}
 
-    def _extract_previous_results(self, action_history: List[Dict[str, Any]]) -> str:
+    def _compressed_json_text(self, value: Any, max_size: int) -> str:
+        """JSON text of _compress_tool_output(value), serializing small values only once."""
+        try:
+            raw = _json_bytes(value)
+            if len(raw) <= max_size:
+                return raw.decode("utf-8")
+        except Exception:
+            pass
+        return _json_bytes(self._compress_tool_output(value, max_size=max_size)).decode("utf-8")
+
+    def _extract_previous_results(self, action_history: List[AgentAction]) -> str:
         if not action_history:
             return "No previous results available."
 
         chunks = []
         for action in action_history[-2:]:
-            res: AgentResult = action["result"]
+            res: AgentResult = action.result
             if not res.is_success() or not res.result:
                 continue
-            safe = SecurityPolicy.redact_sensitive_data(res.result)
-            compressed = self._compress_tool_output(safe, max_size=400)
-            chunks.append(f"{action['tool']}: {json.dumps(compressed, default=str)}")
+            chunks.append(f"{action.tool}: {self._compressed_json_text(res.redacted_result(), 400)}")
 
         return "\n".join(chunks) if chunks else "No previous successful outputs."
 
+    def _get_params_desc(
+        self,
+        server_url: Optional[str],
+        tool_name: Optional[str],
+        schema: Dict[str, Any],
+        props: Dict[str, Any],
+        required: List[str],
+    ) -> str:
+        """Schema description for the parameter prompt, built once per tool schema."""
+        key = (server_url, tool_name)
+        cached = self._params_desc_cache.get(key)
+        if cached is not None and cached[0] is schema:
+            return cached[1]
+
+        required_set = frozenset(required)
+        lines = []
+        for pname, pschema in props.items():
+            ptype = pschema.get("type", "string")
+            pdesc = pschema.get("description", "")
+            penum = pschema.get("enum")
+            line = f"- {pname} ({ptype})" + (" [REQUIRED]" if pname in required_set else "")
+            if pdesc:
+                line += f": {pdesc}"
+            if penum:
+                line += f" allowed={penum}"
+            lines.append(line)
+
+        # Keyed on schema identity too: a refreshed tool brings a new schema object
+        desc = "\n".join(lines)
+        self._params_desc_cache[key] = (schema, desc)
+        return desc
+
     def _generate_tool_parameters(
         self,
         tool: Dict[str, Any],
         user_message: str,
-        action_history: List[Dict[str, Any]]
+        action_history: List[AgentAction]
     ) -> Dict[str, Any]:
         tool_name = tool.get("name")
         schema = tool.get("input_schema") or tool.get("inputSchema") or {}
@@ -2524,8 +3510,8 @@ JSON only:"""
             if "ref" in props and action_history:
                 # Look for browser_snapshot in recent history
                 for action in reversed(action_history[-5:]):
-                    if action["tool"] == "browser_snapshot" and action["result"].is_success():
-                        result = action["result"].result
+                    if action.tool == "browser_snapshot" and action.result.is_success():
+                        result = action.result.result
                         if isinstance(result, dict):
                             content = result.get("content", [])
                             if isinstance(content, list) and content:
@@ -2545,34 +3531,20 @@ JSON only:"""
             if tool_name == "browser_type" and "text" in props:
                 # Simple heuristic: extract quoted text or keywords from user message
                 # Look for quoted text first
-                quoted = re.findall(r'["\']([^"\']+)["\']', user_message)
-                if quoted:
-                    auto_extracted["text"] = quoted[0]
-                    self._log("INFO", "auto_extracted_text", {"text": quoted[0]})
-                # Or look for license plate patterns
-                elif re.search(r'\b[A-Z]{2}\d{3}[A-Z]{2}\b', user_message):
-                    match = re.search(r'\b([A-Z]{2}\d{3}[A-Z]{2})\b', user_message)
-                    if match:
-                        auto_extracted["text"] = match.group(1)
-                        self._log("INFO", "auto_extracted_text", {"text": match.group(1)})
+                match = _QUOTED_RE.search(user_message)
+                # Or look for license plate patterns (one scan, no separate probe)
+                if match is None:
+                    match = _PLATE_RE.search(user_message)
+                if match:
+                    auto_extracted["text"] = match.group(1)
+                    self._log("INFO", "auto_extracted_text", {"text": match.group(1)})
 
         # If we auto-extracted ALL required params, return immediately (no LLM call needed)
         if auto_extracted and all(req in auto_extracted for req in required):
             self._log("INFO", "using_auto_extracted_params", {"tool": tool_name, "params": auto_extracted})
             return self._filter_and_validate_params(auto_extracted, schema)
 
-        lines = []
-        for pname, pschema in props.items():
-            ptype = pschema.get("type", "string")
-            pdesc = pschema.get("description", "")
-            penum = pschema.get("enum")
-            is_req = pname in required
-            line = f"- {pname} ({ptype})" + (" [REQUIRED]" if is_req else "")
-            if pdesc:
-                line += f": {pdesc}"
-            if penum:
-                line += f" allowed={penum}"
-            lines.append(line)
+        params_desc = self._get_params_desc(tool.get("_server_url"), tool_name, schema, props, required)
 
         # ✅ FIX: Better context extraction with more detail for required params
         ctx = ""
@@ -2580,13 +3552,13 @@ JSON only:"""
             # Get last 2 successful actions for context
             last_successes = [
                 a for a in action_history[-3:] 
-                if a["result"].is_success() and a["result"].result
+                if a.result.is_success() and a.result.result
             ]
             
             if last_successes:
                 ctx_lines = []
                 for action in last_successes:
-                    res = action["result"].result
+                    res = action.result.result
                     if isinstance(res, dict):
                         # Extract content more verbosely for ref extraction
                         content = res.get("content", [])
@@ -2596,12 +3568,12 @@ JSON only:"""
                             for item in content[:5]:
                                 if isinstance(item, dict):
                                     # Include ALL fields, especially 'ref'
-                                    content_preview.append(json.dumps(item, default=str))
+                                    content_preview.append(_json_bytes(item).decode("utf-8"))
                                 else:
                                     content_preview.append(str(item)[:200])
                             
                             ctx_lines.append(
-                                f"Previous {action['tool']} result:\n" + 
+                                f"Previous {action.tool} result:\n" + 
                                 "\n".join(content_preview)
                             )
                 
@@ -2616,7 +3588,7 @@ JSON only:"""
 
 Tool: {tool_name}
 Schema:
-{chr(10).join(lines)}
+{params_desc}
 
 User message: "{user_message}"
 {ctx}
@@ -2628,9 +3600,7 @@ Return ONLY a JSON object."""
 
         parsed: Dict[str, Any] = {}
         try:
-            self.budget.add_tokens(TokenEstimator.estimate_tokens(prompt))
-            raw = self.llm_provider.generate(prompt).strip()
-            self.budget.add_tokens(TokenEstimator.estimate_tokens(raw))
+            raw = self._llm_generate(prompt, self.PARAMETER_EXTRACTION_SYSTEM)
             obj = self._extract_first_json_object(raw) or {}
             if isinstance(obj, dict):
                 parsed = obj
@@ -2643,31 +3613,28 @@ Return ONLY a JSON object."""
     # FINAL RESPONSE
     # =========================================================================
 
-    def _generate_final_response(self, user_message: str, action_history: List[Dict[str, Any]]) -> str:
+    def _generate_final_response(self, user_message: str, action_history: List[AgentAction]) -> str:
         if not action_history:
             return "I couldn't find any suitable tools to complete your request."
 
         blocks = []
         key_previews: List[str] = []
         for action in action_history:
-            res: AgentResult = action["result"]
-            step_num = action["step"]
-            tool_name = action["tool"]
+            res: AgentResult = action.result
+            step_num = action.step
+            tool_name = action.tool
             if res.is_success():
-                safe = SecurityPolicy.redact_sensitive_data(res.result or {})
-                compressed = self._compress_tool_output(safe, max_size=400)
-                preview = self._result_preview_text(safe, max_chars=220)
+                compressed = self._compressed_json_text(res.redacted_result(), 400)
+                preview = self._action_preview_text(res, max_chars=220)
                 if preview:
                     key_previews.append(f"Step {step_num}: {preview}")
-                    blocks.append(
-                        f"Step {step_num} ({tool_name}): {json.dumps(compressed, default=str)} | preview: {preview}"
-                    )
+                    blocks.append(f"Step {step_num} ({tool_name}): {compressed} | preview: {preview}")
                 else:
-                    blocks.append(f"Step {step_num} ({tool_name}): {json.dumps(compressed, default=str)}")
+                    blocks.append(f"Step {step_num} ({tool_name}): {compressed}")
             else:
                 blocks.append(f"Step {step_num} ({tool_name}): FAILED - {res.error or 'Unknown error'}")
 
-        success_count = sum(1 for a in action_history if a["result"].is_success())
+        success_count = sum(1 for a in action_history if a.result.is_success())
         blocks_text = "\n".join(blocks)
         previews_text = "\n".join(f"- {p}" for p in key_previews) if key_previews else "- none"
 
@@ -2688,9 +3655,7 @@ IMPORTANT:
 Now respond to the user in FIRST PERSON:"""
 
         try:
-            self.budget.add_tokens(TokenEstimator.estimate_tokens(prompt))
-            resp = self.llm_provider.generate(prompt).strip()
-            self.budget.add_tokens(TokenEstimator.estimate_tokens(resp))
+            resp = self._llm_generate(prompt, self.FINAL_RESPONSE_SYSTEM)
             if key_previews and not self._response_mentions_key_preview(resp, key_previews):
                 # Generic grounding guard: append authoritative outputs if response omits them.
                 joined = "; ".join(key_previews[:3])
@@ -2734,7 +3699,7 @@ Now respond to the user in FIRST PERSON:"""
         self.budget.add_tokens(TokenEstimator.estimate_tokens(user_message))
         stream_callback({"event": "start", "message": user_message})
 
-        action_history: List[Dict[str, Any]] = []
+        action_history: List[AgentAction] = []
         if self.memory_enabled and self._persistent_history:
             action_history = list(self._persistent_history)
             self._log("INFO", "memory_loaded", {"actions_count": len(action_history)})
@@ -2749,6 +3714,7 @@ Now respond to the user in FIRST PERSON:"""
 
         for step in range(max_steps):
             current_step = len(action_history) + 1
+            self._sweep_cooldowns(current_step)
             self._log("INFO", "step_started", {"step": current_step, "iteration": step + 1})
             stream_callback({"event": "step_start", "step": current_step})
 
@@ -2819,7 +3785,9 @@ Now respond to the user in FIRST PERSON:"""
                 self._log("WARNING", "no_tool_selected", {})
                 break
 
-            selected_tool["_parameters"] = self._generate_tool_parameters(selected_tool, user_message, action_history)
+            selected_tool["_parameters"] = await self._run_blocking(
+                self._generate_tool_parameters, selected_tool, user_message, action_history
+            )
             
             self._log("INFO", "tool_selected", {
                 "tool": selected_tool["name"],
@@ -2831,12 +3799,12 @@ Now respond to the user in FIRST PERSON:"""
             result = await self._execute_tool_with_retry(selected_tool)
             stream_callback({"event": "tool_executed", "tool": selected_tool["name"], "status": result.status})
 
-            action_history.append({
-                "step": current_step,
-                "tool": selected_tool["name"],
-                "parameters": selected_tool.get("_parameters", {}),
-                "result": result,
-            })
+            action_history.append(AgentAction(
+                step=current_step,
+                tool=selected_tool["name"],
+                parameters=selected_tool.get("_parameters", {}),
+                result=result,
+            ))
 
             guard = self._update_loop_guard(
                 selected_tool["name"],
@@ -2862,7 +3830,13 @@ Now respond to the user in FIRST PERSON:"""
             else:
                 self._plan_failures = 0
 
-            await asyncio.sleep(0.15)
+            # No fixed pause: wait only as long as the limiter that just rejected
+            # this tool asks (inter_step_delay is an opt-in minimum)
+            delay = self.inter_step_delay
+            if result.error_type == ErrorType.RATE_LIMIT:
+                delay = max(delay, self._rate_limit_wait(selected_tool))
+            if delay:
+                await asyncio.sleep(delay)
 
         # Update memory
         if self.memory_enabled:
@@ -2872,11 +3846,11 @@ Now respond to the user in FIRST PERSON:"""
                 self._persistent_history = action_history
 
         new_actions = action_history[initial_length:]
-        response = self._generate_final_response(user_message, new_actions)
+        response = await self._run_blocking(self._generate_final_response, user_message, new_actions)
 
         self._log("INFO", "run_completed", {
             "actions_executed": len(new_actions),
-            "success_rate": (sum(1 for a in new_actions if a["result"].is_success()) / len(new_actions)) if new_actions else 0.0,
+            "success_rate": (sum(1 for a in new_actions if a.result.is_success()) / len(new_actions)) if new_actions else 0.0,
             "tokens_used": self.budget.tokens_used,
         })
         
@@ -2906,18 +3880,7 @@ Now respond to the user in FIRST PERSON:"""
         self._log("INFO", "cancellation_requested", {})
 
     def get_metrics(self) -> Dict[str, Any]:
-        tool_stats = []
-        for key, m in self.tool_metrics.items():
-            tool_stats.append({
-                "key": key,
-                "tool": m.tool_name,
-                "server": m.server_id,
-                "success_count": m.success_count,
-                "failure_count": m.failure_count,
-                "success_rate": m.success_rate(),
-                "avg_latency": m.avg_latency(),
-                "consecutive_failures": m.consecutive_failures,
-            })
+        tool_stats = [m.to_dict(key) for key, m in self.tool_metrics.items()]
 
         health_stats = []
         for sid, h in self.server_health.items():
@@ -2932,7 +3895,7 @@ Now respond to the user in FIRST PERSON:"""
             "tokens_used": self.budget.tokens_used,
             "tool_calls_made": self.budget.tool_calls_made,
             "payload_bytes": self.budget.payload_bytes,
-            "elapsed_time": time.time() - self.budget.start_time if hasattr(self.budget, "start_time") else 0.0,
+            "elapsed_time": time.monotonic() - self.budget._start_monotonic,
         }
 
         return {
@@ -2954,19 +3917,19 @@ Now respond to the user in FIRST PERSON:"""
             },
         }
 
-    def export_logs(self, format: str = "json") -> str:
+    def export_logs(self, format: str = "json", indent: Optional[int] = 2) -> str:
         if format == "json":
-            return json.dumps([asdict(l) for l in self.structured_logs], indent=2)
+            return _json_text([l.to_dict() for l in self.structured_logs], indent=indent)
         if format == "text":
             return "\n".join([f"[{l.timestamp}] [{l.level}] {l.event}: {l.data}" for l in self.structured_logs])
         raise ValueError(f"Unknown format: {format}")
 
-    def save_test_trace(self, filepath: str) -> None:
+    def save_test_trace(self, filepath: str, indent: Optional[int] = 2) -> None:
         trace_data = {
             "trace_id": self.trace_id,
-            "logs": [asdict(l) for l in self.structured_logs],
+            "logs": [l.to_dict() for l in self.structured_logs],
             "metrics": self.get_metrics()
         }
         with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(trace_data, f, indent=2)
+            f.write(_json_text(trace_data, indent=indent))
         self._log("INFO", "trace_saved", {"filepath": filepath})
@@ -0,0 +1,20 @@
+from polymcp.polyagent.skills_sh import load_skills_sh
+
+
+def _load_from(base):
+    return [entry for entry in load_skills_sh([str(base)]) if base in entry.path.parents]
+
+
+def test_load_skills_sh_reuses_entries_until_the_file_changes(tmp_path):
+    base = tmp_path.resolve()
+    skill_file = base / "demo" / "SKILL.md"
+    skill_file.parent.mkdir()
+    skill_file.write_text("---\nname: demo\ndescription: first\n---\nBody\n", encoding="utf-8")
+
+    first = _load_from(base)
+    assert [entry.description for entry in first] == ["first"]
+    assert _load_from(base)[0] is first[0]
+
+    skill_file.write_text("---\nname: demo\ndescription: second version\n---\nBody\n", encoding="utf-8")
+    second = _load_from(base)
+    assert [entry.description for entry in second] == ["second version"]
@@ -1,7 +1,11 @@
+import asyncio
+import json
+import threading
+
 import pytest
 
 from polymcp.polyagent.llm_providers import LLMProvider
-from polymcp.polyagent.unified_agent import AgentResult, UnifiedPolyAgent
+from polymcp.polyagent.unified_agent import AgentAction, AgentResult, ErrorType, UnifiedPolyAgent
 
 
 class DummyProvider(LLMProvider):
@@ -9,6 +13,20 @@ class DummyProvider(LLMProvider):
         return '{"achieved": false, "confidence": 0.0, "reason": "stub"}'
 
 
+def _make_agent(**overrides):
+    options = dict(
+        llm_provider=DummyProvider(),
+        use_planner=False,
+        use_validator=False,
+        skills_sh_enabled=False,
+        enable_rate_limiting=False,
+        enable_health_checks=False,
+        verbose=False,
+    )
+    options.update(overrides)
+    return UnifiedPolyAgent(**options)
+
+
 @pytest.mark.asyncio
 async def test_conservative_validation_stops_on_equal_threshold(monkeypatch):
     agent = UnifiedPolyAgent(
@@ -104,14 +122,15 @@ def test_final_response_appends_key_outputs_when_response_not_grounded(monkeypat
     )
 
     action_history = [
-        {
-            "step": 1,
-            "tool": "browser_navigate",
-            "result": AgentResult(
+        AgentAction(
+            step=1,
+            tool="browser_navigate",
+            parameters={},
+            result=AgentResult(
                 status="success",
                 result={"content": [{"type": "text", "text": "Example Domain"}]},
             ),
-        }
+        )
     ]
 
     monkeypatch.setattr(
@@ -127,3 +146,410 @@ def test_final_response_appends_key_outputs_when_response_not_grounded(monkeypat
 
     assert "Key outputs:" in response
     assert "Example Domain" in response
+
+
+def test_results_identical_ignores_key_order():
+    agent = _make_agent()
+
+    a = {"status": "ok", "items": [{"b": 2, "a": 1}]}
+    b = {"items": [{"a": 1, "b": 2}], "status": "ok"}
+
+    assert agent._are_results_identical(a, b)
+    assert not agent._are_results_identical(a, {"status": "ok", "items": [{"a": 1}]})
+    # Plain == semantics: equal numbers match, container types and key types do not
+    assert agent._are_results_identical({"n": 1}, {"n": 1.0})
+    assert not agent._are_results_identical({"v": (1, 2)}, {"v": [1, 2]})
+    assert not agent._are_results_identical({1: "x"}, {"1": "x"})
+
+
+def test_schema_validator_type_checks():
+    from polymcp.polyagent.unified_agent import SchemaValidator
+
+    schema = {
+        "type": "object",
+        "properties": {
+            "count": {"type": "integer", "minimum": 1},
+            "tags": {"type": "array"},
+            "anything": {"type": ["string", "null"]},
+        },
+        "required": ["count"],
+    }
+
+    ok, err, _ = SchemaValidator.validate_parameters({"count": 2, "tags": [], "anything": 3}, schema)
+    assert ok and err is None
+
+    ok, err, _ = SchemaValidator.validate_parameters({"count": "2"}, schema)
+    assert not ok and err == "Parameter 'count' should be integer"
+
+    ok, err, _ = SchemaValidator.validate_parameters({"count": 0}, schema)
+    assert not ok and err == "Parameter 'count' must be >= 1"
+
+
+def test_extract_first_json_object_handles_fences_and_string_braces():
+    extract = UnifiedPolyAgent._extract_first_json_object
+
+    assert extract('```json\n{"a": 1}\n```') == {"a": 1}
+    assert extract('Sure: {"tool": "x", "parameters": {"q": "a } b"}} done') == {
+        "tool": "x",
+        "parameters": {"q": "a } b"},
+    }
+    assert extract('{"a": [1, 2,],}') == {"a": [1, 2]}
+    assert extract("see {not json} then {\"ok\": true}") == {"ok": True}
+    assert extract("no object here") is None
+
+
+@pytest.mark.asyncio
+async def test_read_only_tool_results_are_cached():
+    agent = _make_agent(tool_result_cache_ttl=60.0)
+    calls = []
+
+    class FakeAdapter:
+        async def invoke_tool(self, name, parameters):
+            calls.append((name, parameters))
+            return {"status": "success", "result": {"n": len(calls)}}
+
+    agent.stdio_adapters["stdio://fake"] = FakeAdapter()
+    read_tool = {
+        "name": "lookup",
+        "_server_url": "stdio://fake",
+        "_server_type": "stdio",
+        "annotations": {"readOnlyHint": True},
+    }
+    write_tool = {"name": "write", "_server_url": "stdio://fake", "_server_type": "stdio"}
+
+    assert await agent._execute_tool_internal(read_tool, {"a": 1, "b": 2}) == {"n": 1}
+    assert await agent._execute_tool_internal(read_tool, {"b": 2, "a": 1}) == {"n": 1}
+    assert await agent._execute_tool_internal(read_tool, {"a": 2}) == {"n": 2}
+    assert await agent._execute_tool_internal(write_tool, {}) == {"n": 3}
+    assert await agent._execute_tool_internal(write_tool, {}) == {"n": 4}
+
+    # A write on the server invalidates its cached reads
+    assert await agent._execute_tool_internal(read_tool, {"a": 1, "b": 2}) == {"n": 5}
+    hit = await agent._execute_tool_internal(read_tool, {"a": 1, "b": 2})
+    assert hit == {"n": 5}
+
+    # Hits are independent copies
+    hit["n"] = -1
+    assert await agent._execute_tool_internal(read_tool, {"a": 1, "b": 2}) == {"n": 5}
+
+
+@pytest.mark.asyncio
+async def test_tool_result_cache_skips_error_results():
+    agent = _make_agent(tool_result_cache_ttl=60.0)
+    calls = []
+
+    class FlakyAdapter:
+        async def invoke_tool(self, name, parameters):
+            calls.append(name)
+            if len(calls) == 1:
+                return {"isError": True, "content": [{"type": "text", "text": "busy"}]}
+            return {"status": "success", "result": {"ok": True}}
+
+    agent.stdio_adapters["stdio://fake"] = FlakyAdapter()
+    tool = {"name": "lookup", "_server_url": "stdio://fake", "_server_type": "stdio", "annotations": {"readOnlyHint": True}}
+
+    assert (await agent._execute_tool_internal(tool, {}))["isError"] is True
+    assert await agent._execute_tool_internal(tool, {}) == {"ok": True}
+    assert await agent._execute_tool_internal(tool, {}) == {"ok": True}
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_plan_cache_reuses_plans_for_repeated_requests(monkeypatch):
+    agent = _make_agent(
+        use_planner=True,
+        plan_cache_size=8,
+        plan_embedding_fn=lambda text: [1.0, 0.0] if "weather" in text.lower() else [0.0, 1.0],
+    )
+    prompts = []
+
+    async def fake_tools(user_message, max_tools=50):
+        return [{"name": "get_weather", "description": "Weather lookup"}]
+
+    async def fake_generate(prompt, system=""):
+        prompts.append(prompt)
+        return '{"plan": [{"step": 1, "action": "look up", "tool_hint": "get_weather"}]}'
+
+    monkeypatch.setattr(agent, "_get_tools_for_planner", fake_tools)
+    monkeypatch.setattr(agent, "_llm_generate_async", fake_generate)
+
+    first = await agent._create_plan("Weather in Rome?")
+    assert await agent._create_plan("  weather in rome? ") == first
+    assert await agent._create_plan("What's the weather in Paris?") == first
+    assert len(prompts) == 1
+
+    await agent._create_plan("Convert 3 EUR to USD")
+    assert len(prompts) == 2
+
+
+def test_agent_result_is_transient_error():
+    assert AgentResult(status="error", error_type=ErrorType.TIMEOUT).is_transient_error()
+
+
+@pytest.mark.asyncio
+async def test_run_async_keeps_llm_calls_off_the_event_loop(monkeypatch):
+    agent = _make_agent()
+    tool = {
+        "name": "search",
+        "input_schema": {"type": "object", "properties": {"q": {"type": "string"}}},
+        "_server_url": "dummy://server",
+        "_server_type": "http",
+    }
+    provider_threads = []
+
+    def fake_generate(prompt, **kwargs):
+        provider_threads.append(threading.get_ident())
+        return '{"q": "x"}'
+
+    async def fake_get_all_tools():
+        return [tool]
+
+    async def fake_execute_tool_with_retry(selected):
+        return AgentResult(status="success", result={"text": "found"})
+
+    monkeypatch.setattr(agent.llm_provider, "generate", fake_generate)
+    monkeypatch.setattr(agent, "_get_all_tools", fake_get_all_tools)
+    monkeypatch.setattr(agent, "_select_tool_with_constraints", lambda *args, **kwargs: dict(tool))
+    monkeypatch.setattr(agent, "_execute_tool_with_retry", fake_execute_tool_with_retry)
+
+    await agent.run_async("search for x", max_steps=1)
+
+    # Parameter extraction and the final response both reached the provider, from worker threads
+    assert len(provider_threads) == 2
+    assert threading.get_ident() not in provider_threads
+
+
+def test_rate_limit_wait_reports_the_slowest_limiter():
+    from polymcp.polyagent.unified_agent import RateLimiter
+
+    agent = _make_agent(enable_rate_limiting=True)
+    tool = {"name": "search", "_server_url": "dummy://server"}
+    assert agent._rate_limit_wait(tool) == 0.0
+
+    limiter = agent.rate_limiters["dummy://server::search"] = RateLimiter(max_calls=1, window_seconds=30.0)
+    limiter.record_call()
+    assert 29.0 < agent._rate_limit_wait(tool) <= 30.0
+
+    agent.enable_rate_limiting = False
+    assert agent._rate_limit_wait(tool) == 0.0
+
+
+def test_register_tool_replaces_relisted_definitions_in_place():
+    agent = _make_agent()
+    old = {"name": "search", "description": "v1", "_server_url": "stdio://a"}
+    other = {"name": "search", "description": "other server", "_server_url": "stdio://b"}
+    new = {"name": "search", "description": "v2", "_server_url": "stdio://a"}
+
+    agent._register_tool("stdio://a", old)
+    agent._register_tool("stdio://b", other)
+    agent._register_tool("stdio://a", new)
+
+    assert agent.tool_registry["search"] == [new, other]
+    assert agent._tool_index[("stdio://a", "search")] is new
+
+
+def test_structured_logs_stay_a_list_trimmed_to_the_cap():
+    agent = _make_agent(max_structured_logs=10)
+    for i in range(25):
+        agent._log("INFO", "tick", {"i": i})
+
+    assert len(agent.structured_logs) <= 11
+    assert [log.data["i"] for log in agent.structured_logs[-3:]] == [22, 23, 24]
+
+
+def test_schema_validator_sees_schemas_mutated_in_place():
+    from polymcp.polyagent.unified_agent import SchemaValidator
+
+    schema = {"type": "object", "properties": {"count": {"type": "integer"}}, "required": []}
+    assert SchemaValidator.validate_parameters({}, schema)[0]
+
+    schema["required"].append("count")
+    ok, err, _ = SchemaValidator.validate_parameters({}, schema)
+    assert not ok and err == "Missing required parameter: count"
+    assert SchemaValidator.required_parameters(schema) == frozenset({"count"})
+
+
+def test_is_valid_date_matches_strptime_rules():
+    from polymcp.polyagent.unified_agent import SchemaValidator
+
+    is_valid = SchemaValidator._is_valid_date
+    assert is_valid("2024-02-29", "date")
+    assert is_valid("2024-1-5", "date")
+    assert not is_valid("2023-02-29", "date")
+    assert not is_valid("2024-13-01", "date")
+    assert not is_valid("2024-01-01T00:00:00", "date")
+
+    assert is_valid("2024-06-30T23:59:59", "date-time")
+    assert is_valid("2024-06-30t23:59:59.123456Z", "date-time")
+    assert is_valid("2024-06-30T23:59:59+02:00", "date-time")
+    assert not is_valid("2024-06-30T24:00:00", "date-time")
+    assert not is_valid("2024-06-30 23:59:59", "date-time")
+    assert not is_valid("2024-06-30", "time")
+
+
+def test_generate_server_id_accepts_unhashable_config_values():
+    config = {"command": "npx", "args": ["server", ["nested"]], "env": {"OPTS": {"a": 1}}}
+
+    server_id = UnifiedPolyAgent._generate_server_id(config)
+    assert server_id.startswith("stdio://npx@")
+    assert UnifiedPolyAgent._generate_server_id(dict(config)) == server_id
+
+
+class FakeStdioClient:
+    running = 0
+    peak = 0
+
+    def __init__(self, config):
+        self.config = config
+        self.stopped = False
+
+    async def start(self):
+        FakeStdioClient.running += 1
+        FakeStdioClient.peak = max(FakeStdioClient.peak, FakeStdioClient.running)
+        await asyncio.sleep(0.01)
+        FakeStdioClient.running -= 1
+        if self.config.command == "broken":
+            raise RuntimeError("spawn failed")
+
+    async def stop(self):
+        self.stopped = True
+
+
+class FakeStdioAdapter:
+    def __init__(self, client):
+        self.client = client
+
+    async def get_tools(self):
+        return [{"name": f"{self.client.config.command}_tool", "input_schema": {}}]
+
+
+@pytest.mark.asyncio
+async def test_start_launches_stdio_servers_concurrently_within_the_limit(monkeypatch):
+    from polymcp.polyagent import unified_agent
+
+    monkeypatch.setattr(unified_agent, "MCPStdioClient", FakeStdioClient)
+    monkeypatch.setattr(unified_agent, "MCPStdioAdapter", FakeStdioAdapter)
+    FakeStdioClient.running = FakeStdioClient.peak = 0
+    commands = [f"server{i}" for i in range(6)]
+    agent = _make_agent(
+        stdio_servers=[{"command": command, "args": []} for command in commands],
+        max_discovery_concurrency=3,
+    )
+
+    await agent.start()
+    try:
+        assert FakeStdioClient.peak == 3
+        # Registered in configuration order, whatever order the handshakes finished in
+        assert [client.config.command for client in agent.stdio_clients.values()] == commands
+    finally:
+        await agent.stop()
+
+
+@pytest.mark.asyncio
+async def test_start_stops_started_servers_when_one_fails(monkeypatch):
+    from polymcp.polyagent import unified_agent
+
+    started = []
+
+    class RecordingClient(FakeStdioClient):
+        async def start(self):
+            await super().start()
+            started.append(self)
+
+    monkeypatch.setattr(unified_agent, "MCPStdioClient", RecordingClient)
+    monkeypatch.setattr(unified_agent, "MCPStdioAdapter", FakeStdioAdapter)
+    agent = _make_agent(stdio_servers=[{"command": "ok1"}, {"command": "broken"}, {"command": "ok2"}])
+
+    with pytest.raises(RuntimeError, match="spawn failed"):
+        await agent.start()
+    assert [client.config.command for client in started] == ["ok1", "ok2"]
+    assert all(client.stopped for client in started)
+    assert not agent.stdio_clients
+    await agent.stop()
+
+
+def test_signature_window_forgets_signatures_that_leave_the_window():
+    from polymcp.polyagent.unified_agent import SignatureWindow
+
+    window = SignatureWindow(3)
+    for signature in (b"a", b"b", b"a"):
+        window.append(signature)
+    assert b"a" in window and b"b" in window and len(window) == 3
+
+    window.append(b"c")  # evicts the first b"a"; the second one is still inside
+    assert b"a" in window and len(window) == 3
+    window.append(b"d")  # evicts b"b"
+    assert b"b" not in window
+    window.append(b"e")  # evicts the last b"a"
+    assert b"a" not in window
+    assert [s for s in (b"c", b"d", b"e") if s in window] == [b"c", b"d", b"e"]
+
+    window.clear()
+    assert len(window) == 0 and b"c" not in window
+
+
+def test_redaction_is_copy_on_write_and_logs_are_detached():
+    from polymcp.polyagent.unified_agent import SecurityPolicy
+
+    clean = {"query": "weather", "items": [{"city": "Rome"}]}
+    assert SecurityPolicy.redact_sensitive_data(clean) is clean
+
+    secret = {"query": "weather", "auth": {"api_key": "k"}, "items": clean["items"]}
+    redacted = SecurityPolicy.redact_sensitive_data(secret)
+    assert redacted == {"query": "weather", "auth": "[REDACTED]", "items": [{"city": "Rome"}]}
+    assert secret["auth"] == {"api_key": "k"}
+
+    agent = _make_agent()
+    agent._log("INFO", "tool_selected", {"parameters": clean})
+    clean["items"].append({"city": "Paris"})
+    assert agent.structured_logs[-1].data == {"parameters": {"query": "weather", "items": [{"city": "Rome"}]}}
+
+
+def test_log_file_entries_go_through_the_queued_writer(tmp_path):
+    log_path = tmp_path / "agent.log"
+    agent = _make_agent(log_file=str(log_path))
+
+    agent._log("INFO", "first", {"n": 1})
+    agent._stop_log_writer()  # drains the queue and closes the file
+    assert [json.loads(line)["event"] for line in log_path.read_text().splitlines()] == ["first"]
+
+    agent._log("INFO", "second", {"n": 2})  # reopens the writer
+    agent._stop_log_writer()
+    assert [json.loads(line)["event"] for line in log_path.read_text().splitlines()] == ["first", "second"]
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_is_the_only_stdio_tool_lister():
+    agent = _make_agent(tools_cache_ttl=60.0)
+    release = asyncio.Event()
+    listings = []
+
+    class GatedAdapter:
+        async def get_tools(self):
+            listings.append(1)
+            await release.wait()
+            return [{"name": "lookup", "input_schema": {}}]
+
+    agent.stdio_adapters["stdio://fake"] = GatedAdapter()
+    agent._start_tools_refresh()
+    await asyncio.sleep(0)  # the task starts listing and holds the server's lock
+
+    lookup = asyncio.ensure_future(agent._get_all_tools())
+    await asyncio.sleep(0.01)
+    release.set()
+    assert [t["name"] for t in await lookup] == ["lookup"]
+    assert len(listings) == 1
+
+    # Expired entries are left to the background task instead of being relisted inline
+    tools, _ = agent.stdio_tools_cache["stdio://fake"]
+    agent.stdio_tools_cache["stdio://fake"] = (tools, 0.0)
+    await agent._get_all_tools()
+    assert len(listings) == 1
+
+    # Once the task is gone (as when the sync run() loop closes), lookups refresh expired entries themselves
+    agent._tools_refresh_task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await agent._tools_refresh_task
+    await agent._get_all_tools()
+    assert len(listings) == 2
+    await agent.stop()